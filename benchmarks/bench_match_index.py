@@ -0,0 +1,51 @@
+# Micro-benchmark for title/date reconciliation: the old per-item any(events_match(...))
+# scan against MatchIndex. Run from the repository root:
+#   python benchmarks/bench_match_index.py
+import os
+import sys
+import time
+import random
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from reconcile import MatchIndex, events_match
+
+
+def make_items(n, seed):
+    rnd = random.Random(seed)
+    base = datetime.date(2025, 1, 1)
+    return [(f"Task {rnd.randrange(n * 4)}", (base + datetime.timedelta(days=rnd.randrange(365))).isoformat())
+            for _ in range(n)]
+
+def scan(google, notion):
+    return sum(1 for title, date in google
+               if any(events_match(title, date, n_title, n_date) for n_title, n_date in notion))
+
+def indexed(google, notion):
+    index = MatchIndex()
+    for n_title, n_date in notion:
+        index.add_notion(None, n_title, n_date)
+    return sum(1 for title, date in google if index.in_notion(None, title, date))
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [250, 500, 1000, 2000, 4000]
+    print(f"{'items':>7} {'scan (s)':>10} {'index (s)':>10} {'index µs/item':>14}")
+    for n in sizes:
+        google, notion = make_items(n, 1), make_items(n, 2)
+        matched_index, t_index = timed(indexed, google, notion)
+        # The quadratic scan gets slow quickly, so only run it on the smaller sizes
+        if n <= 2000:
+            matched_scan, t_scan = timed(scan, google, notion)
+            assert matched_scan == matched_index
+            scan_col = f"{t_scan:10.3f}"
+        else:
+            scan_col = f"{'-':>10}"
+        print(f"{n:7d} {scan_col} {t_index:10.4f} {t_index / (2 * n) * 1e6:14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Micro-benchmark for the planning stage alone: plan_sync on in-memory records, no
+# fakes, store or network. Each size is planned three ways: a first run (nothing
+# linked, half the items matching by title and date), a linked run with 5% of the
+# pairs edited, and the same with edits on both sides of every edited pair.
+# Run from the repository root:
+#   python benchmarks/bench_plan.py                 # 10000, 50000 and 100000 items
+#   python benchmarks/bench_plan.py 250000
+import os
+import sys
+import time
+import random
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from records import NotionTask, GoogleEvent, content_hash
+from sync_plan import plan_sync
+
+
+def make_records(n, rnd):
+    base = datetime.date(2025, 1, 1)
+    tasks, events = [], []
+    for i in range(n):
+        date = (base + datetime.timedelta(days=rnd.randrange(365))).isoformat()
+        tasks.append(NotionTask(f"page-{i}", f"Task {i}", date, last_edited_time="2025-01-01T00:00:00.000Z"))
+        title = f"Task {i}" if i % 2 else f"Event {i}"
+        events.append(GoogleEvent(f"event-{i}", title, {"date": date}, {"date": date},
+                                  updated="2025-01-01T00:00:00.000Z"))
+    return tasks, events
+
+def link(tasks, events):
+    # The stored rows of a converged run: every item paired under one Shared ID
+    cache = {}
+    for i, (task, ev) in enumerate(zip(tasks, events)):
+        sid = f"sid-{i}"
+        task.sid = ev.sid = sid
+        ev.title, ev.date, ev.tagged = task.title, task.date, True
+        cache[sid] = {"title": task.title, "date": task.date, "page_id": task.id, "event_id": ev.id,
+                      "notion_hash": content_hash(task.title, task.date),
+                      "google_hash": content_hash(ev.title, ev.date)}
+    return cache
+
+def edit(tasks, events, fraction, rnd, both_sides):
+    for i in rnd.sample(range(len(tasks)), max(1, int(len(tasks) * fraction))):
+        if both_sides or i % 2:
+            tasks[i].title += " (notion)"
+        if both_sides or not i % 2:
+            events[i].title += " (google)"
+            events[i].updated = "2025-01-02T00:00:00.000Z"
+
+def timed(tasks, events, cache):
+    t0 = time.perf_counter()
+    plan = plan_sync(tasks, events, cache)
+    return plan, time.perf_counter() - t0
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 50000, 100000]
+    print(f"{'items':>7} {'scenario':<22} {'plan s':>8} {'µs/item':>8} {'writes':>7}")
+    for n in sizes:
+        rnd = random.Random(n)
+        tasks, events = make_records(n, rnd)
+        sequence = 0
+
+        def new_sid():
+            nonlocal sequence
+            sequence += 1
+            return f"new-{sequence}"
+
+        t0 = time.perf_counter()
+        plan = plan_sync(tasks, events, {}, new_sid=new_sid)
+        rows = [("first run", plan, time.perf_counter() - t0)]
+        cache = link(tasks, events)
+        edit(tasks, events, 0.05, rnd, both_sides=False)
+        rows.append(("linked, 5% edited", *timed(tasks, events, cache)))
+        edit(tasks, events, 0.05, rnd, both_sides=True)
+        rows.append(("linked, 5% conflicts", *timed(tasks, events, cache)))
+        for name, plan, seconds in rows:
+            print(f"{n:7d} {name:<22} {seconds:8.3f} {seconds / n * 1e6:8.2f} {plan.api_writes():7d}")
+
+if __name__ == "__main__":
+    main()
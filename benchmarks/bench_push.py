@@ -0,0 +1,174 @@
+# Push-sync check against the fakes: the fake Calendar's simulated notifier POSTs to
+# a local webhook receiver, and one pair's daemon loop (SyncTrigger, WatchChannel,
+# WebhookReceiver and run_sync, as in sync_cli) runs on a thread. Measures how long
+# an edit takes to reach the other side and how many syncs a burst of edits costs,
+# with times scaled down so the whole run takes a few seconds. Run from the
+# repository root:
+#   python benchmarks/bench_push.py
+#   python benchmarks/bench_push.py --items 1000 --burst 50
+import os
+import sys
+import time
+import argparse
+import datetime
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fake_apis import FakeNotion, FakeCalendar
+from gcal_batch import google_bucket
+from notion_writer import notion_bucket
+from push_sync import RENEW_MARGIN, SyncTrigger, WatchChannel, WebhookReceiver, notion_changed
+from sync_engine import run_sync
+from sync_metrics import SyncMetrics
+from sync_store import SyncStore
+
+DATABASE_ID = "bench-database"
+CALENDAR_ID = "primary"
+WINDOW_DAYS = 30
+
+
+class NullLog:
+    def write(self, msg):
+        pass
+
+
+class Daemon:
+    # sync_cli.run_pair's daemon loop for one pair, counting its runs. The store is
+    # opened on the loop's thread, as SQLite connections stay on their thread.
+    def __init__(self, notion, gcal, store_path, receiver, args):
+        self.notion = notion
+        self.gcal = gcal
+        self.store_path = store_path
+        self.receiver = receiver
+        self.args = args
+        self.trigger = SyncTrigger(args.min_interval, args.max_interval, args.debounce, args.max_delay)
+        self.syncs = 0
+        self.busy = False
+        self.notified = 0
+        self.polls = 0
+        self.renewals = 0
+        self.thread = threading.Thread(target=self.loop, name="bench-pair", daemon=True)
+
+    def loop(self):
+        store = SyncStore(self.store_path)
+        self.channel = WatchChannel(self.gcal, CALENDAR_ID, f"http://127.0.0.1:{self.receiver.port}/", store,
+                                    NullLog(), ttl=RENEW_MARGIN + self.args.channel_seconds)
+        try:
+            self.run(store)
+        finally:
+            self.channel.stop()
+            store.close()
+
+    def run(self, store):
+        while True:
+            metrics = SyncMetrics("bench")
+            now = datetime.datetime.utcnow()
+            self.busy = True
+            run_sync(self.notion, self.gcal, DATABASE_ID, now, now + datetime.timedelta(days=WINDOW_DAYS), NullLog(),
+                     store=store, calendar_id=CALENDAR_ID, metrics=metrics)
+            self.syncs += 1
+            self.busy = False
+            self.trigger.polled(notion_changed(metrics))
+            live, replaced = self.channel.ensure()
+            self.receiver.register(live, self.trigger)
+            if replaced:
+                self.receiver.unregister(replaced)
+                self.renewals += 1
+            notified = self.trigger.wait(self.channel.wait_timeout())
+            if notified is None:
+                break
+            if notified:
+                self.notified += notified
+            else:
+                self.polls += 1
+
+    def wait_until(self, check, timeout=30):
+        deadline = time.monotonic() + timeout
+        while not check():
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise TimeoutError("change did not propagate")
+            time.sleep(0.005)
+
+    def settle(self, check):
+        # Waits for the change and for the run that made it to finish
+        self.wait_until(check)
+        self.wait_until(lambda: not self.busy)
+
+
+def notion_title(notion, page_id):
+    return "".join(t["plain_text"] for t in notion.store[page_id]["properties"]["Task"]["title"])
+
+def google_event(gcal, title):
+    return next((ev for ev in gcal.store.values() if ev.get("summary") == title), None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure push-triggered sync latency against local fake APIs.")
+    parser.add_argument("--items", type=int, default=200, help="tasks and events seeded per side")
+    parser.add_argument("--burst", type=int, default=20, help="Google edits made back to back")
+    parser.add_argument("--debounce", type=float, default=0.2, help="quiet time that ends a burst (seconds)")
+    parser.add_argument("--max-delay", type=float, default=2.0, help="longest a burst is held back (seconds)")
+    parser.add_argument("--min-interval", type=float, default=0.5, help="shortest Notion poll interval (seconds)")
+    parser.add_argument("--max-interval", type=float, default=4.0, help="longest Notion poll interval (seconds)")
+    parser.add_argument("--channel-seconds", type=float, default=3.0,
+                        help="seconds until the first watch channel is due for renewal")
+    args = parser.parse_args()
+    notion_bucket.set_rate(1e9)
+    google_bucket.set_rate(1e9)
+
+    notion, gcal = FakeNotion(), FakeCalendar()
+    today = datetime.datetime.utcnow().date()
+    page_ids = []
+    for i in range(args.items):
+        date = (today + datetime.timedelta(days=1 + i % (WINDOW_DAYS - 2))).isoformat()
+        page_ids.append(notion.seed_task(DATABASE_ID, f"Task {i}", date))
+        gcal.seed_event(CALENDAR_ID, f"Task {i}", date)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        receiver = WebhookReceiver("127.0.0.1", 0).start()
+        daemon = Daemon(notion, gcal, os.path.join(tmp, "bench.db"), receiver, args)
+        try:
+            daemon.thread.start()
+            daemon.wait_until(lambda: daemon.syncs >= 1)
+            # Lets the echo of the first run's writes settle before measuring
+            time.sleep(args.debounce * 3)
+            rows = []
+
+            syncs = daemon.syncs
+            ev = google_event(gcal, "Task 1")
+            start = time.perf_counter()
+            gcal.edit_event_summary(ev["id"], "Task 1 (pushed)")
+            daemon.settle(lambda: notion_title(notion, page_ids[1]) == "Task 1 (pushed)")
+            rows.append(("google edit", time.perf_counter() - start, daemon.syncs - syncs))
+
+            time.sleep(args.debounce * 3)
+            syncs = daemon.syncs
+            last = args.burst - 1
+            start = time.perf_counter()
+            for i in range(args.burst):
+                gcal.edit_event_summary(google_event(gcal, f"Task {10 + i}")["id"], f"Task {10 + i} (burst)")
+            daemon.settle(lambda: notion_title(notion, page_ids[10 + last]) == f"Task {10 + last} (burst)")
+            rows.append((f"{args.burst} google edits", time.perf_counter() - start, daemon.syncs - syncs))
+
+            # Idle long enough for the poll interval to back off before Notion changes
+            time.sleep(args.max_interval * 2)
+            syncs = daemon.syncs
+            interval = daemon.trigger.interval
+            start = time.perf_counter()
+            notion.edit_task(page_ids[3], title="Task 3 (polled)")
+            daemon.settle(lambda: google_event(gcal, "Task 3 (polled)") is not None)
+            rows.append((f"notion edit (poll {interval:.1f}s)", time.perf_counter() - start, daemon.syncs - syncs))
+
+            print(f"{'change':<28} {'latency s':>10} {'syncs':>6}")
+            for name, seconds, runs in rows:
+                print(f"{name:<28} {seconds:10.3f} {runs:6d}")
+            print(f"runs {daemon.syncs}: {daemon.notified} notifications coalesced, {daemon.polls} polls; "
+                  f"{daemon.renewals} channel renewals, {len(gcal.watch_channels)} channel(s) open, "
+                  f"{gcal.notifications_sent} notifications delivered")
+        finally:
+            daemon.trigger.stop()
+            daemon.thread.join(10)
+            receiver.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Cold-start benchmark for the headless path: each sample is a fresh interpreter
+# that imports sync_cli and builds both clients from a stored token, which is
+# everything the CLI does before its first API request. No network is used: the
+# token is a made-up, still valid credential. Run from the repository root:
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --runs 20
+import os
+import sys
+import json
+import pickle
+import argparse
+import datetime
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Runs in the child; prints the cumulative seconds at the end of each stage as JSON
+CHILD = """
+import sys, time, json
+start = time.perf_counter()
+marks = {}
+sys.path.insert(0, sys.argv[1])
+import sync_cli
+marks["import"] = time.perf_counter() - start
+log = sync_cli.ConsoleLog()
+sync_cli.init_google_client(None, log, interactive=False, token_path=sys.argv[2])
+marks["google client"] = time.perf_counter() - start
+sync_cli.init_notion_client("secret", log)
+marks["notion client"] = time.perf_counter() - start
+print(json.dumps(marks))
+"""
+
+
+def write_token(path):
+    from google.oauth2.credentials import Credentials
+    creds = Credentials(token="bench-token", refresh_token="bench-refresh", client_id="bench", client_secret="bench",
+                        token_uri="https://oauth2.googleapis.com/token",
+                        expiry=datetime.datetime.utcnow() + datetime.timedelta(hours=1))
+    with open(path, "wb") as f:
+        pickle.dump(creds, f)
+
+def sample(token_path):
+    start = datetime.datetime.now()
+    out = subprocess.run([sys.executable, "-c", CHILD, ROOT, token_path], capture_output=True, text=True, check=True)
+    marks = json.loads(out.stdout.strip().splitlines()[-1])
+    marks["process"] = (datetime.datetime.now() - start).total_seconds()
+    return marks
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the CLI's cold start up to its first API request.")
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters to sample")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        token_path = os.path.join(tmp, "token.json")
+        write_token(token_path)
+        before = os.stat(token_path).st_mtime_ns
+        samples = [sample(token_path) for _ in range(args.runs)]
+        rewritten = os.stat(token_path).st_mtime_ns != before
+    print(f"{'stage':<16} {'median s':>9} {'min s':>7}")
+    for stage in ("import", "google client", "notion client", "process"):
+        values = [s[stage] for s in samples]
+        print(f"{stage:<16} {statistics.median(values):9.3f} {min(values):7.3f}")
+    print("stages are cumulative from interpreter start-up; process includes interpreter start and exit. "
+          f"token file rewritten: {'yes' if rewritten else 'no'}")
+
+if __name__ == "__main__":
+    main()
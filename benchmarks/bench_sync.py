@@ -0,0 +1,196 @@
+# End-to-end sync benchmark against the in-process fakes in fake_apis.py; no network
+# or credentials needed. Each size is seeded with that many Notion tasks and Google
+# events (half of them matching by title and date) and then taken through full and
+# incremental runs. Run from the repository root:
+#   python benchmarks/bench_sync.py                         # 100, 1000 and 10000 items
+#   python benchmarks/bench_sync.py 1000 --latency-ms 50 --rate-limit-every 40
+#   python benchmarks/bench_sync.py 10000 --extra-properties 10 --memory
+#   python benchmarks/bench_sync.py --report after.json --compare before.json
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from fake_apis import FakeNotion, FakeCalendar
+from gcal_batch import google_bucket
+from notion_writer import notion_bucket
+from sync_engine import run_sync
+from sync_metrics import SyncMetrics
+from sync_store import SyncStore
+
+DATABASE_ID = "bench-database"
+CALENDAR_ID = "primary"
+WINDOW_DAYS = 30
+# Phases of run_sync shown as columns: reading both sides, planning, and carrying the plan out
+STAGE_COLUMNS = (("fetch", "fetch"), ("plan", "plan"), ("execute", "exec"))
+
+
+class NullLog:
+    def write(self, msg):
+        pass
+
+
+def seed(n, notion, gcal, rnd):
+    # Odd tasks have an identically titled event on the same day; the rest only exist on one side
+    today = datetime.datetime.utcnow().date()
+    task_ids, event_ids = [], []
+    for i in range(n):
+        date = (today + datetime.timedelta(days=1 + rnd.randrange(WINDOW_DAYS - 2))).isoformat()
+        task_ids.append(notion.seed_task(DATABASE_ID, f"Task {i}", date))
+        if i % 2:
+            event_ids.append(gcal.seed_event(CALENDAR_ID, f"Task {i}", date))
+        else:
+            other = (today + datetime.timedelta(days=1 + rnd.randrange(WINDOW_DAYS - 2))).isoformat()
+            event_ids.append(gcal.seed_event(CALENDAR_ID, f"Event {i}", other))
+    return task_ids, event_ids
+
+def edit(notion, gcal, task_ids, event_ids, fraction, rnd, label):
+    # Disjoint samples, so no pair is edited on both sides at once
+    k = max(1, int(len(task_ids) * fraction))
+    picked = rnd.sample(range(len(task_ids)), 2 * k)
+    for i in picked[:k]:
+        notion.edit_task(task_ids[i], title=f"Task {i} ({label})")
+    for i in picked[k:]:
+        gcal.edit_event_summary(event_ids[i], f"Event {i} ({label})")
+
+def run(name, n, notion, gcal, store, incremental, memory=False):
+    notion.reset_counts()
+    gcal.reset_counts()
+    metrics = SyncMetrics(name)
+    now = datetime.datetime.utcnow()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    run_sync(notion, gcal, DATABASE_ID, now, now + datetime.timedelta(days=WINDOW_DAYS), NullLog(),
+             incremental=incremental, store=store, calendar_id=CALENDAR_ID, metrics=metrics)
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    data = metrics.as_dict()
+    live_events = sum(1 for ev in gcal.store.values() if ev["status"] != "cancelled")
+    return {
+        "items": n,
+        "scenario": name,
+        "seconds": seconds,
+        "phases": data["phases"],
+        "api_calls": {endpoint: stats["count"] for endpoint, stats in data["calls"].items()},
+        "counters": data["counters"],
+        "server_calls": {"notion": dict(notion.calls), "google": dict(gcal.calls)},
+        "rate_limited": {"notion": notion.rate_limited, "google": gcal.rate_limited},
+        "bytes_received": {"notion": notion.bytes_sent, "google": gcal.bytes_sent},
+        "peak_memory": peak,
+        # Both sides hold the same number of items once a run has converged
+        "consistent": len(notion.store) == live_events,
+    }
+
+def bench_size(n, args):
+    rnd = random.Random(n)
+    latency = args.latency_ms / 1000
+    notion = FakeNotion(latency, args.rate_limit_every, args.retry_after, args.extra_properties)
+    gcal = FakeCalendar(latency, args.rate_limit_every, args.retry_after)
+    task_ids, event_ids = seed(n, notion, gcal, rnd)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SyncStore(os.path.join(tmp, "bench.db"))
+        try:
+            results.append(run("full: first run", n, notion, gcal, store, incremental=False, memory=args.memory))
+            edit(notion, gcal, task_ids, event_ids, 0.05, rnd, "full")
+            results.append(run("full: 5% edited", n, notion, gcal, store, incremental=False, memory=args.memory))
+            results.append(run("incremental: cold", n, notion, gcal, store, incremental=True, memory=args.memory))
+            results.append(run("incremental: idle", n, notion, gcal, store, incremental=True, memory=args.memory))
+            edit(notion, gcal, task_ids, event_ids, 0.01, rnd, "incremental")
+            results.append(run("incremental: 1% edited", n, notion, gcal, store, incremental=True, memory=args.memory))
+            # Picks up the sync's own writes from the run before; nothing should be written back
+            results.append(run("incremental: echo", n, notion, gcal, store, incremental=True, memory=args.memory))
+        finally:
+            store.close()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results, baseline):
+    header = f"{'items':>6} {'scenario':<24} {'total s':>8}"
+    header += "".join(f" {label + ' s':>7}" for _, label in STAGE_COLUMNS)
+    header += f" {'notion':>7} {'google':>7} {'n KB':>8} {'g KB':>8}"
+    if any(r["peak_memory"] is not None for r in results):
+        header += f" {'peak MB':>8}"
+    header += f" {'ok':>3}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+    for r in results:
+        line = f"{r['items']:6d} {r['scenario']:<24} {r['seconds']:8.3f}"
+        line += "".join(f" {r['phases'].get(phase, 0):7.3f}" for phase, _ in STAGE_COLUMNS)
+        line += f" {sum(r['server_calls']['notion'].values()):7d} {sum(r['server_calls']['google'].values()):7d}"
+        line += f" {r['bytes_received']['notion'] / 1024:8.0f} {r['bytes_received']['google'] / 1024:8.0f}"
+        if r["peak_memory"] is not None:
+            line += f" {r['peak_memory'] / 2 ** 20:8.1f}"
+        line += f" {'yes' if r['consistent'] else 'NO':>3}"
+        before = baseline.get((r["items"], r["scenario"]))
+        if before:
+            line += f" {(r['seconds'] - before) / before * 100:+7.1f}%"
+        elif baseline:
+            line += f" {'-':>8}"
+        print(line)
+    print("notion/google: server-side API calls (Calendar batch items counted one by one); "
+          "n/g KB: response bytes received")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full and incremental syncs against local fake APIs.")
+    parser.add_argument("sizes", nargs="*", type=int, default=[100, 1000, 10000], help="items per side")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per HTTP round trip")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth call with a 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After sent with injected 429s")
+    parser.add_argument("--extra-properties", type=int, default=0,
+                        help="unsynced text properties to add to every Notion page")
+    parser.add_argument("--memory", action="store_true", help="trace peak memory per run (slows runs down)")
+    parser.add_argument("--api-rate-limits", action="store_true",
+                        help="keep the client-side request budgets (by default they are lifted)")
+    parser.add_argument("--report", metavar="PATH", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="an earlier --report to compare total times against")
+    args = parser.parse_args()
+
+    if not args.api_rate_limits:
+        notion_bucket.set_rate(1e9)
+        google_bucket.set_rate(1e9)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {(r["items"], r["scenario"]): r["seconds"] for r in json.load(f)["results"]}
+
+    results = []
+    for n in args.sizes:
+        results.extend(bench_size(n, args))
+    print_table(results, baseline)
+
+    if args.report:
+        report = {
+            "created": datetime.datetime.utcnow().isoformat() + "Z",
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {k: v for k, v in vars(args).items() if k not in ("report", "compare")},
+            "results": results,
+        }
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,739 @@
+# In-process stand-ins for the Notion and Google Calendar endpoints the sync uses,
+# for benchmarks and offline runs. They take the same arguments as notion_client.Client
+# and the googleapiclient Calendar service, paginate like the real APIs, sleep for a
+# configurable latency per HTTP round trip and can inject 429 responses. Calendar
+# watch channels are served by a simulated notifier that POSTs to their address.
+import json
+import uuid
+import time
+import queue
+import datetime
+import threading
+import urllib.request
+import httpx
+import httplib2
+from notion_client.errors import APIResponseError, APIErrorCode
+from googleapiclient.errors import HttpError
+
+NOTION_MAX_PAGE_SIZE = 100
+GOOGLE_MAX_RESULTS = 2500
+GOOGLE_DEFAULT_MAX_RESULTS = 250
+NOTES = "Agenda, links and notes that people keep on their tasks and events. " * 3
+
+
+class FakeAPI:
+    # Latency, 429 injection, call counting and response sizes shared by both fakes.
+    # Every rate_limit_every-th round trip is answered with a 429.
+    def __init__(self, latency=0.0, rate_limit_every=0, retry_after=0.0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.calls = {}
+        self.round_trips = 0
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self.lock = threading.RLock()
+
+    def round_trip(self, endpoint, wait=True):
+        # Returns True when this call should be rate limited
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            self.round_trips += 1
+            limited = bool(self.rate_limit_every) and self.round_trips % self.rate_limit_every == 0
+            self.rate_limited += limited
+        if wait and self.latency:
+            time.sleep(self.latency)
+        return limited
+
+    def send(self, body):
+        # Responses go out as JSON, so callers get their own copy and the size is counted
+        text = json.dumps(body)
+        with self.lock:
+            self.bytes_sent += len(text)
+        return json.loads(text)
+
+    def reset_counts(self):
+        with self.lock:
+            self.calls = {}
+            self.round_trips = 0
+            self.rate_limited = 0
+            self.bytes_sent = 0
+
+
+# --- Notion --------------------------------------------------------------------------
+
+def notion_error(status, code, message, retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    body = json.dumps({"object": "error", "status": status, "code": code.value, "message": message})
+    return APIResponseError(httpx.Response(status, headers=headers, text=body), message, code)
+
+def rich_text(content):
+    return [{"type": "text", "text": {"content": content, "link": None}, "plain_text": content}]
+
+def compare(value, condition):
+    # Notion date/timestamp conditions; date-only operands compare on the date part
+    for op, operand in condition.items():
+        current = value[:len(operand)] if len(operand) == 10 else value
+        if op == "equals" and not current == operand:
+            return False
+        if op == "before" and not current < operand:
+            return False
+        if op == "after" and not current > operand:
+            return False
+        if op == "on_or_before" and not current <= operand:
+            return False
+        if op == "on_or_after" and not current >= operand:
+            return False
+    return True
+
+def notion_filter_matches(page, query_filter):
+    if not query_filter:
+        return True
+    if "and" in query_filter:
+        return all(notion_filter_matches(page, f) for f in query_filter["and"])
+    if "or" in query_filter:
+        return any(notion_filter_matches(page, f) for f in query_filter["or"])
+    if query_filter.get("timestamp") in ("last_edited_time", "created_time"):
+        timestamp = query_filter["timestamp"]
+        return compare(page[timestamp], query_filter[timestamp])
+    prop = page["properties"].get(query_filter["property"], {})
+    if "date" in query_filter:
+        start = (prop.get("date") or {}).get("start")
+        condition = query_filter["date"]
+        if condition.get("is_empty"):
+            return start is None
+        if condition.get("is_not_empty"):
+            return start is not None
+        return start is not None and compare(start, condition)
+    if "rich_text" in query_filter:
+        text = "".join(t["plain_text"] for t in prop.get("rich_text", []))
+        condition = query_filter["rich_text"]
+        if condition.get("is_empty"):
+            return not text
+        if condition.get("is_not_empty"):
+            return bool(text)
+        if "equals" in condition:
+            return text == condition["equals"]
+        if "contains" in condition:
+            return condition["contains"] in text
+    raise ValueError(f"Unsupported filter in fake Notion: {query_filter}")
+
+
+# Named like notion_client's endpoint classes so metrics report the same endpoint names
+class DatabasesEndpoint:
+    def __init__(self, api):
+        self.api = api
+
+    def retrieve(self, database_id, **kwargs):
+        if self.api.round_trip("databases.retrieve"):
+            raise notion_error(429, APIErrorCode.RateLimited, "Rate limited", self.api.retry_after)
+        properties = {name: {"id": prop_id, "name": name, "type": prop_type}
+                      for name, (prop_id, prop_type) in self.api.schema().items()}
+        return self.api.send({"object": "database", "id": database_id, "properties": properties})
+
+    def query(self, database_id, filter=None, sorts=None, start_cursor=None, page_size=NOTION_MAX_PAGE_SIZE,
+              filter_properties=None, **kwargs):
+        api = self.api
+        if api.round_trip("databases.query"):
+            raise notion_error(429, APIErrorCode.RateLimited, "Rate limited", api.retry_after)
+        with api.lock:
+            if start_cursor:
+                # A cursor holds the rest of the result set it was issued with
+                if start_cursor not in api.cursors:
+                    raise notion_error(400, APIErrorCode.ValidationError, "start_cursor is invalid")
+                page_ids = api.cursors.pop(start_cursor)
+            else:
+                page_ids = [p["id"] for p in api.store.values()
+                            if p["parent"]["database_id"] == database_id and not p["archived"]
+                            and notion_filter_matches(p, filter)]
+            page_size = min(page_size, NOTION_MAX_PAGE_SIZE)
+            chunk, rest = page_ids[:page_size], page_ids[page_size:]
+            next_cursor = None
+            if rest:
+                next_cursor = str(uuid.uuid4())
+                api.cursors[next_cursor] = rest
+            return api.send({
+                "object": "list",
+                "results": [api.render(api.store[page_id], filter_properties) for page_id in chunk],
+                "next_cursor": next_cursor,
+                "has_more": bool(rest),
+            })
+
+
+class PagesEndpoint:
+    def __init__(self, api):
+        self.api = api
+
+    def create(self, parent, properties, **kwargs):
+        if self.api.round_trip("pages.create"):
+            raise notion_error(429, APIErrorCode.RateLimited, "Rate limited", self.api.retry_after)
+        return self.api.send(self.api.render(self.api.add_page(parent["database_id"], properties)))
+
+    def update(self, page_id, properties=None, archived=None, **kwargs):
+        if self.api.round_trip("pages.update"):
+            raise notion_error(429, APIErrorCode.RateLimited, "Rate limited", self.api.retry_after)
+        with self.api.lock:
+            if page_id not in self.api.store:
+                raise notion_error(404, APIErrorCode.ObjectNotFound, f"Could not find page with ID: {page_id}")
+            page = self.api.edit_page(page_id, properties or {})
+            if archived is not None:
+                page["archived"] = archived
+            return self.api.send(self.api.render(page))
+
+
+class FakeNotion(FakeAPI):
+    # A stand-in for notion_client.Client holding the pages of any number of databases.
+    # last_edited_time advances one second per write and is reported at minute
+    # granularity like the real API. extra_properties adds that many unsynced text
+    # properties to every page, as real databases have.
+    PROPERTY_IDS = {"Task": "title", "Due Date": "%3EdUe", "Shared ID": "sH%3Ar"}
+
+    def __init__(self, latency=0.0, rate_limit_every=0, retry_after=0.0, extra_properties=0):
+        super().__init__(latency, rate_limit_every, retry_after)
+        self.extra_properties = extra_properties
+        self.store = {}
+        self.cursors = {}
+        self.clock = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        self.databases = DatabasesEndpoint(self)
+        self.pages = PagesEndpoint(self)
+
+    def tick(self):
+        self.clock += datetime.timedelta(seconds=1)
+        return self.clock.strftime("%Y-%m-%dT%H:%M:00.000Z")
+
+    def schema(self):
+        schema = {"Task": ("title", "title"), "Due Date": (self.PROPERTY_IDS["Due Date"], "date"),
+                  "Shared ID": (self.PROPERTY_IDS["Shared ID"], "rich_text")}
+        for i in range(self.extra_properties):
+            schema[f"Notes {i + 1}"] = (f"n{i + 1:03d}", "rich_text")
+        return schema
+
+    def set_property(self, page, name, value):
+        prop_id = self.PROPERTY_IDS.get(name, name)
+        if "title" in value:
+            content = "".join(t["text"]["content"] for t in value["title"])
+            page["properties"][name] = {"id": prop_id, "type": "title", "title": rich_text(content)}
+        elif "rich_text" in value:
+            content = "".join(t["text"]["content"] for t in value["rich_text"])
+            page["properties"][name] = {"id": prop_id, "type": "rich_text", "rich_text": rich_text(content) if content else []}
+        elif "date" in value:
+            date = value["date"] and {"start": value["date"]["start"], "end": value["date"].get("end"), "time_zone": None}
+            page["properties"][name] = {"id": prop_id, "type": "date", "date": date}
+        else:
+            raise ValueError(f"Unsupported property in fake Notion: {name}={value}")
+
+    def add_page(self, database_id, properties):
+        with self.lock:
+            now = self.tick()
+            page_id = str(uuid.uuid4())
+            user = {"object": "user", "id": "5e0d1c1e-0000-4000-8000-000000000001"}
+            page = {
+                "object": "page",
+                "id": page_id,
+                "created_time": now,
+                "last_edited_time": now,
+                "created_by": user,
+                "last_edited_by": user,
+                "cover": None,
+                "icon": None,
+                "archived": False,
+                "in_trash": False,
+                "parent": {"type": "database_id", "database_id": database_id},
+                "properties": {
+                    "Task": {"id": "title", "type": "title", "title": []},
+                    "Due Date": {"id": self.PROPERTY_IDS["Due Date"], "type": "date", "date": None},
+                    "Shared ID": {"id": self.PROPERTY_IDS["Shared ID"], "type": "rich_text", "rich_text": []},
+                },
+                "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+                "public_url": None,
+            }
+            for i in range(self.extra_properties):
+                page["properties"][f"Notes {i + 1}"] = {"id": f"n{i + 1:03d}", "type": "rich_text", "rich_text": rich_text(NOTES)}
+            for name, value in properties.items():
+                self.set_property(page, name, value)
+            self.store[page["id"]] = page
+            return page
+
+    def edit_page(self, page_id, properties):
+        with self.lock:
+            page = self.store[page_id]
+            for name, value in properties.items():
+                self.set_property(page, name, value)
+            page["last_edited_time"] = self.tick()
+            return page
+
+    def render(self, page, filter_properties=None):
+        if filter_properties:
+            page = dict(page, properties={name: prop for name, prop in page["properties"].items()
+                                          if prop["id"] in filter_properties or name in filter_properties})
+        return page
+
+    # Seeding and out-of-band edits for benchmarks; these are not API calls
+    def seed_task(self, database_id, title, date, sid=None):
+        properties = {"Task": {"title": [{"text": {"content": title}}]}, "Due Date": {"date": {"start": date}}}
+        if sid:
+            properties["Shared ID"] = {"rich_text": [{"text": {"content": sid}}]}
+        return self.add_page(database_id, properties)["id"]
+
+    def edit_task(self, page_id, title=None, date=None):
+        properties = {}
+        if title is not None:
+            properties["Task"] = {"title": [{"text": {"content": title}}]}
+        if date is not None:
+            properties["Due Date"] = {"date": {"start": date}}
+        self.edit_page(page_id, properties)
+
+
+# --- Google Calendar ------------------------------------------------------------------
+
+def google_error(status, reason, message):
+    content = json.dumps({"error": {"code": status, "message": message,
+                                    "errors": [{"reason": reason, "message": message}]}}).encode()
+    return HttpError(httplib2.Response({"status": status}), content)
+
+def merge_patch(target, patch):
+    # PATCH semantics: nested objects are merged, everything else is replaced
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge_patch(target[key], value)
+        else:
+            target[key] = json.loads(json.dumps(value))
+
+def event_bounds(ev):
+    def parse(when):
+        if "dateTime" in when:
+            value = datetime.datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00"))
+            return value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)
+        return datetime.datetime.fromisoformat(when["date"]).replace(tzinfo=datetime.timezone.utc)
+    return parse(ev["start"]), parse(ev["end"])
+
+def parse_rfc3339(value):
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def parse_rrule_time(value):
+    # UNTIL=20250131 or UNTIL=20250131T090000Z
+    if "T" in value:
+        return datetime.datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=datetime.timezone.utc)
+    return datetime.datetime.strptime(value, "%Y%m%d").replace(tzinfo=datetime.timezone.utc)
+
+def occurrence_starts(master, limit):
+    # Start times of a series master up to limit. The fake only understands
+    # FREQ=DAILY and FREQ=WEEKLY with INTERVAL, COUNT and UNTIL.
+    start, _ = event_bounds(master)
+    rule = dict(part.split("=", 1) for part in master["recurrence"][0].partition(":")[2].split(";"))
+    step = datetime.timedelta(days=int(rule.get("INTERVAL", 1)) * (7 if rule["FREQ"] == "WEEKLY" else 1))
+    count = int(rule["COUNT"]) if "COUNT" in rule else None
+    until = min(parse_rrule_time(rule["UNTIL"]), limit) if "UNTIL" in rule else limit
+    n = 0
+    while (count is None or n < count) and start <= until:
+        yield start
+        start += step
+        n += 1
+
+def series_bounds(master, limit):
+    starts = list(occurrence_starts(master, limit))
+    first, end = event_bounds(master)
+    if not starts:
+        return first, first
+    return first, starts[-1] + (end - first)
+
+def parse_fields(spec):
+    # "a,b(c,d/e)" -> {"a": {}, "b": {"c": {}, "d": {"e": {}}}}; an empty dict selects everything below
+    def parse(i, tree):
+        while i < len(spec):
+            j = i
+            while j < len(spec) and spec[j] not in ",()":
+                j += 1
+            node = tree
+            for part in spec[i:j].strip().split("/"):
+                if part:
+                    node = node.setdefault(part, {})
+            if j < len(spec) and spec[j] == "(":
+                j = parse(j + 1, node)
+            if j < len(spec) and spec[j] == ")":
+                return j + 1
+            i = j + 1
+        return i
+
+    tree = {}
+    parse(0, tree)
+    return tree
+
+def project(value, tree):
+    # Applies a parsed fields= selection the way the Google APIs do
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: project(value[key], sub) for key, sub in tree.items() if key in value}
+
+
+class FakeRequest:
+    # Mirrors googleapiclient's HttpRequest: nothing is sent until execute().
+    # fields= trims the response before it is sent.
+    def __init__(self, api, endpoint, fn, fields=None):
+        self.api = api
+        self.endpoint = endpoint
+        self.fn = fn
+        self.fields = parse_fields(fields) if fields else {}
+
+    def response(self):
+        return self.api.send(project(self.fn(), self.fields))
+
+    def execute(self):
+        if self.api.round_trip(self.endpoint):
+            raise google_error(429, "rateLimitExceeded", "Rate Limit Exceeded")
+        return self.response()
+
+
+class FakeBatch:
+    # One round trip for the whole batch; every item can still fail on its own
+    def __init__(self, api, callback):
+        self.api = api
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None, callback=None):
+        self.requests.append((request_id or str(len(self.requests)), request, callback or self.callback))
+
+    def execute(self):
+        if self.api.round_trip("batch"):
+            raise google_error(429, "rateLimitExceeded", "Rate Limit Exceeded")
+        for request_id, request, callback in self.requests:
+            # Items ride on the batch's round trip but are counted (and rate limited) one by one
+            if self.api.round_trip(f"batch:{request.endpoint}", wait=False):
+                callback(request_id, None, google_error(429, "rateLimitExceeded", "Rate Limit Exceeded"))
+                continue
+            try:
+                response = request.response()
+            except HttpError as e:
+                callback(request_id, None, e)
+            else:
+                callback(request_id, response, None)
+
+
+class FakeEvents:
+    def __init__(self, api):
+        self.api = api
+
+    def list(self, calendarId, timeMin=None, timeMax=None, singleEvents=False, orderBy=None, syncToken=None,
+             pageToken=None, maxResults=GOOGLE_DEFAULT_MAX_RESULTS, showDeleted=False, privateExtendedProperty=None,
+             fields=None, **kwargs):
+        api = self.api
+
+        def run():
+            with api.lock:
+                if syncToken and (timeMin or timeMax or orderBy or privateExtendedProperty):
+                    raise google_error(400, "invalid", "syncToken cannot be combined with these parameters")
+                if orderBy == "startTime" and not singleEvents:
+                    raise google_error(400, "invalid", "orderBy=startTime requires singleEvents")
+                if pageToken:
+                    if pageToken not in api.page_tokens:
+                        raise google_error(400, "invalid", "Invalid page token")
+                    events, next_sync = api.page_tokens.pop(pageToken)
+                else:
+                    if syncToken and (not syncToken.isdigit() or int(syncToken) > api.sequence
+                                      or int(syncToken) < api.sync_floor):
+                        raise google_error(410, "fullSyncRequired", "Sync token is no longer valid")
+                    events = list(api.listing(calendarId, singleEvents))
+                    if syncToken:
+                        # Changes since the token, deletions included
+                        events = [ev for ev in events if ev["sequence_no"] > int(syncToken)]
+                    else:
+                        if not showDeleted:
+                            events = [ev for ev in events if ev["status"] != "cancelled"]
+                        if timeMin:
+                            events = [ev for ev in events if api.bounds(ev)[1] > parse_rfc3339(timeMin)]
+                        if timeMax:
+                            events = [ev for ev in events if api.bounds(ev)[0] < parse_rfc3339(timeMax)]
+                    props = privateExtendedProperty or []
+                    for prop in [props] if isinstance(props, str) else props:
+                        key, _, value = prop.partition("=")
+                        events = [ev for ev in events
+                                  if ev.get("extendedProperties", {}).get("private", {}).get(key) == value]
+                    if orderBy == "startTime":
+                        events.sort(key=lambda ev: event_bounds(ev)[0])
+                    # No sync token is issued for ordered listings
+                    next_sync = None if orderBy else str(api.sequence)
+                size = min(maxResults, GOOGLE_MAX_RESULTS)
+                chunk, rest = events[:size], events[size:]
+                resp = {"kind": "calendar#events", "items": [api.render(ev) for ev in chunk]}
+                if rest:
+                    token = str(uuid.uuid4())
+                    api.page_tokens[token] = (rest, next_sync)
+                    resp["nextPageToken"] = token
+                elif next_sync:
+                    resp["nextSyncToken"] = next_sync
+                return resp
+
+        return FakeRequest(api, "events.list", run, fields)
+
+    def get(self, calendarId, eventId, fields=None, **kwargs):
+        api = self.api
+
+        def run():
+            with api.lock:
+                ev = api.lookup(calendarId, eventId)
+                if ev is None:
+                    raise google_error(404, "notFound", "Not Found")
+                return api.render(ev)
+
+        return FakeRequest(api, "events.get", run, fields)
+
+    def instances(self, calendarId, eventId, timeMin=None, timeMax=None, pageToken=None,
+                  maxResults=GOOGLE_DEFAULT_MAX_RESULTS, showDeleted=False, fields=None, **kwargs):
+        api = self.api
+
+        def run():
+            with api.lock:
+                if pageToken:
+                    if pageToken not in api.page_tokens:
+                        raise google_error(400, "invalid", "Invalid page token")
+                    events, _ = api.page_tokens.pop(pageToken)
+                else:
+                    master = api.store.get(eventId)
+                    if master is None or master["calendarId"] != calendarId or "recurrence" not in master:
+                        raise google_error(404, "notFound", "Not Found")
+                    events = [ev for ev in api.instances_of(master)
+                              if (showDeleted or ev["status"] != "cancelled")
+                              and (not timeMin or event_bounds(ev)[1] > parse_rfc3339(timeMin))
+                              and (not timeMax or event_bounds(ev)[0] < parse_rfc3339(timeMax))]
+                size = min(maxResults, GOOGLE_MAX_RESULTS)
+                chunk, rest = events[:size], events[size:]
+                resp = {"kind": "calendar#events", "items": [api.render(ev) for ev in chunk]}
+                if rest:
+                    token = str(uuid.uuid4())
+                    api.page_tokens[token] = (rest, None)
+                    resp["nextPageToken"] = token
+                return resp
+
+        return FakeRequest(api, "events.instances", run, fields)
+
+    def insert(self, calendarId, body, fields=None, **kwargs):
+        return FakeRequest(self.api, "events.insert", lambda: self.api.render(self.api.add_event(calendarId, body)),
+                           fields)
+
+    def patch(self, calendarId, eventId, body, fields=None, **kwargs):
+        api = self.api
+
+        def run():
+            with api.lock:
+                ev = api.lookup(calendarId, eventId)
+                if ev is None:
+                    raise google_error(404, "notFound", "Not Found")
+                if eventId not in api.store:
+                    # Editing one occurrence turns it into an exception of its series
+                    api.store[eventId] = ev
+                return api.render(api.edit_event(eventId, body))
+
+        return FakeRequest(api, "events.patch", run, fields)
+
+    def watch(self, calendarId, body, **kwargs):
+        api = self.api
+
+        def run():
+            with api.lock:
+                channel = {
+                    "kind": "api#channel",
+                    "id": body["id"],
+                    "resourceId": uuid.uuid4().hex,
+                    "resourceUri": f"https://www.googleapis.com/calendar/v3/calendars/{calendarId}/events",
+                    "token": body.get("token"),
+                    "expiration": str(int((time.time() + int(body.get("params", {}).get("ttl", 604800))) * 1000)),
+                }
+                api.watch_channels[body["id"]] = dict(channel, calendarId=calendarId, address=body["address"], messages=0)
+                api.post(api.watch_channels[body["id"]], "sync")
+                return channel
+
+        return FakeRequest(api, "events.watch", run)
+
+
+class FakeChannels:
+    def __init__(self, api):
+        self.api = api
+
+    def stop(self, body, **kwargs):
+        api = self.api
+
+        def run():
+            with api.lock:
+                channel = api.watch_channels.get(body["id"])
+                if channel is None or channel["resourceId"] != body.get("resourceId"):
+                    raise google_error(404, "notFound", f"Channel '{body['id']}' not found for project")
+                del api.watch_channels[body["id"]]
+                return ""
+
+        return FakeRequest(api, "channels.stop", run)
+
+
+class FakeCalendar(FakeAPI):
+    # A stand-in for the Calendar v3 service. Every write bumps a global sequence
+    # number; a sync token is the sequence number it was issued at.
+    def __init__(self, latency=0.0, rate_limit_every=0, retry_after=0.0):
+        super().__init__(latency, rate_limit_every, retry_after)
+        self.store = {}
+        self.page_tokens = {}
+        self.sequence = 0
+        # Sync tokens issued before this sequence number answer 410 Gone
+        self.sync_floor = 0
+        self.clock = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+        self.events_resource = FakeEvents(self)
+        self.channels_resource = FakeChannels(self)
+        self.watch_channels = {}
+        self.outbox = queue.Queue()
+        self.notifier = None
+        self.notifications_sent = 0
+
+    def events(self):
+        return self.events_resource
+
+    def channels(self):
+        return self.channels_resource
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def touch(self, ev):
+        self.sequence += 1
+        self.clock += datetime.timedelta(seconds=1)
+        ev["sequence_no"] = self.sequence
+        ev["updated"] = self.clock.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        ev["etag"] = f'"{self.sequence}"'
+        for channel in self.watch_channels.values():
+            if channel["calendarId"] == ev["calendarId"]:
+                self.post(channel, "exists")
+
+    def post(self, channel, state):
+        # Queued for the notifier thread, so writes never wait on the receiver
+        channel["messages"] += 1
+        self.outbox.put((channel["address"], {
+            "X-Goog-Channel-ID": channel["id"],
+            "X-Goog-Channel-Token": channel["token"] or "",
+            "X-Goog-Channel-Expiration": channel["expiration"],
+            "X-Goog-Resource-ID": channel["resourceId"],
+            "X-Goog-Resource-URI": channel["resourceUri"],
+            "X-Goog-Resource-State": state,
+            "X-Goog-Message-Number": str(channel["messages"]),
+        }))
+        if self.notifier is None:
+            self.notifier = threading.Thread(target=self.deliver, name="fake-notifier", daemon=True)
+            self.notifier.start()
+
+    def deliver(self):
+        while True:
+            address, headers = self.outbox.get()
+            try:
+                urllib.request.urlopen(urllib.request.Request(address, data=b"", headers=headers, method="POST"),
+                                       timeout=5).close()
+                with self.lock:
+                    self.notifications_sent += 1
+            except OSError:
+                # Like Google, a receiver that is down just misses the message
+                pass
+
+    def add_event(self, calendar_id, body):
+        with self.lock:
+            # Fields a real event resource carries but the sync never reads
+            event_id = uuid.uuid4().hex
+            ev = {
+                "kind": "calendar#event",
+                "id": event_id,
+                "status": "confirmed",
+                "htmlLink": f"https://www.google.com/calendar/event?eid={event_id}",
+                "created": self.clock.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "creator": {"email": "owner@example.com", "self": True},
+                "organizer": {"email": "owner@example.com", "self": True},
+                "iCalUID": f"{event_id}@google.com",
+                "sequence": 0,
+                "reminders": {"useDefault": True},
+                "eventType": "default",
+                "calendarId": calendar_id,
+            }
+            ev.update(json.loads(json.dumps(body)))
+            self.touch(ev)
+            self.store[ev["id"]] = ev
+            return ev
+
+    def edit_event(self, event_id, body):
+        with self.lock:
+            ev = self.store[event_id]
+            merge_patch(ev, body)
+            self.touch(ev)
+            return ev
+
+    def render(self, ev):
+        return {key: value for key, value in ev.items() if key not in ("calendarId", "sequence_no")}
+
+    # Recurring events: a master carries the RRULE; its occurrences are generated on
+    # the fly, and an edited or cancelled occurrence is stored as an exception under
+    # the occurrence's id, with recurringEventId and originalStartTime
+    def expansion_limit(self):
+        # Endless series are expanded this far ahead
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=730)
+
+    def bounds(self, ev):
+        if "recurrence" in ev:
+            return series_bounds(ev, self.expansion_limit())
+        return event_bounds(ev)
+
+    def occurrence(self, master, start):
+        first, end = event_bounds(master)
+        timed = "dateTime" in master["start"]
+        suffix = start.strftime("%Y%m%dT%H%M%SZ") if timed else start.strftime("%Y%m%d")
+        ev = {key: json.loads(json.dumps(value)) for key, value in master.items() if key != "recurrence"}
+        if timed:
+            when = lambda value: {"dateTime": value.isoformat(), "timeZone": master["start"].get("timeZone", "UTC")}
+        else:
+            when = lambda value: {"date": value.date().isoformat()}
+        ev.update({"id": f"{master['id']}_{suffix}", "recurringEventId": master["id"],
+                   "originalStartTime": when(start), "start": when(start), "end": when(start + (end - first))})
+        return ev
+
+    def instances_of(self, master):
+        for start in occurrence_starts(master, self.expansion_limit()):
+            ev = self.occurrence(master, start)
+            yield self.store.get(ev["id"], ev)
+
+    def listing(self, calendar_id, single_events):
+        # Masters are expanded into their occurrences for singleEvents=True; exceptions
+        # are listed on their own otherwise
+        for ev in list(self.store.values()):
+            if ev["calendarId"] != calendar_id:
+                continue
+            if "recurrence" in ev and single_events:
+                yield from self.instances_of(ev)
+            elif not (single_events and ev.get("recurringEventId")):
+                yield ev
+
+    def lookup(self, calendar_id, event_id):
+        ev = self.store.get(event_id)
+        if ev is None and "_" in event_id:
+            master = self.store.get(event_id.rpartition("_")[0])
+            if master is not None and "recurrence" in master:
+                ev = next((occ for occ in self.instances_of(master) if occ["id"] == event_id), None)
+        return ev if ev is not None and ev["calendarId"] == calendar_id else None
+
+    # Seeding and out-of-band edits for benchmarks; these are not API calls
+    def seed_event(self, calendar_id, summary, date, sid=None):
+        # sid is written as a description token, the way older versions tagged events
+        end = (datetime.date.fromisoformat(date) + datetime.timedelta(days=1)).isoformat()
+        body = {"summary": summary, "description": NOTES, "start": {"date": date}, "end": {"date": end}}
+        if sid:
+            body["description"] += f"\nSharedID:{sid}"
+        return self.add_event(calendar_id, body)["id"]
+
+    def seed_series(self, calendar_id, summary, date, rrule):
+        end = (datetime.date.fromisoformat(date) + datetime.timedelta(days=1)).isoformat()
+        return self.add_event(calendar_id, {"summary": summary, "description": NOTES, "start": {"date": date},
+                                            "end": {"date": end}, "recurrence": [f"RRULE:{rrule}"]})["id"]
+
+    def edit_event_summary(self, event_id, summary):
+        self.edit_event(event_id, {"summary": summary})
+
+    def delete_event(self, event_id):
+        with self.lock:
+            ev = self.store[event_id]
+            ev["status"] = "cancelled"
+            self.touch(ev)
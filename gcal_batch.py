@@ -0,0 +1,121 @@
+import time
+from googleapiclient.errors import HttpError
+from rate_limit import TokenBucket, backoff_delay
+from sync_metrics import null_metrics
+
+# Google recommends keeping Calendar batches at 50 calls or fewer
+MAX_BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# Process-wide Calendar budget shared by every sync pair; a batch spends one token per call in it
+GOOGLE_REQUESTS_PER_SECOND = 10.0
+google_bucket = TokenBucket(GOOGLE_REQUESTS_PER_SECOND, capacity=MAX_BATCH_SIZE)
+
+
+class BatchWriteError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        details = "; ".join(f"SID={sid}: {err}" for sid, err in errors.items())
+        super().__init__(f"{len(errors)} Google Calendar write(s) failed: {details}")
+
+
+def is_retryable(exception):
+    if not isinstance(exception, HttpError):
+        return False
+    status = exception.resp.status
+    if status == 403:
+        return b"ratelimitexceeded" in (exception.content or b"").lower()
+    return status in RETRYABLE_STATUSES
+
+def retry_after(exception):
+    try:
+        return float(exception.resp.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class GoogleBatchWriter:
+    # Queues Calendar mutations and sends them through the batch endpoint.
+    # Results and errors are keyed by the Shared ID each request was queued with.
+    # Used as a context manager: the queue is flushed on exit and any failures
+    # are raised together once every queued write has been attempted.
+    def __init__(self, service, log, batch_size=MAX_BATCH_SIZE, bucket=google_bucket, metrics=null_metrics):
+        self.service = service
+        self.log = log
+        self.bucket = bucket
+        self.metrics = metrics
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.pending = []
+        self.retry = []
+        self.retry_errors = []
+        self.results = {}
+        self.errors = {}
+
+    def add(self, request, sid, on_success=None):
+        self.pending.append((request, sid, on_success, 1))
+        if len(self.pending) >= self.batch_size:
+            chunk, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            self.send(chunk)
+
+    def flush(self):
+        # Items that hit rate limits or server errors are collected across chunks
+        # and resent together after one backoff
+        while self.pending or self.retry:
+            while self.pending:
+                chunk, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+                self.send(chunk)
+            if self.retry:
+                self.backoff()
+                self.pending, self.retry = self.retry, []
+
+    def backoff(self):
+        attempt = max(item[3] for item in self.retry) - 1
+        delays = [retry_after(e) for e in self.retry_errors]
+        delay = max((d for d in delays if d is not None), default=None)
+        if any(e.resp.status in (403, 429) for e in self.retry_errors):
+            # Rate limited: every writer sharing the bucket waits, not just this one
+            self.bucket.hold(delay or backoff_delay(attempt))
+        else:
+            time.sleep(delay or backoff_delay(attempt))
+        self.retry_errors = []
+
+    def send(self, chunk):
+        def callback(request_id, response, exception):
+            request, sid, on_success, attempt = chunk[int(request_id)]
+            if exception is None:
+                self.results[sid] = response
+                if on_success:
+                    on_success(response)
+            elif is_retryable(exception) and attempt < MAX_ATTEMPTS:
+                self.metrics.count("google_retries")
+                if exception.resp.status in (403, 429):
+                    self.metrics.count("google_rate_limited")
+                self.retry.append((request, sid, on_success, attempt + 1))
+                self.retry_errors.append(exception)
+            else:
+                self.log.write(f"   ❌ Google write failed for SID={sid}: {exception}")
+                self.metrics.count("google_write_errors")
+                self.errors[sid] = exception
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for i, (request, _, _, _) in enumerate(chunk):
+            batch.add(request, request_id=str(i))
+        self.bucket.acquire(len(chunk))
+        self.metrics.count("google_batch_items", len(chunk))
+        try:
+            self.metrics.timed("google.batch", batch.execute)
+        except HttpError as e:
+            # The batch request itself failed (e.g. a 429 or 5xx), so none of its
+            # items ran: each is retried or failed as if it had failed on its own
+            for i in range(len(chunk)):
+                callback(str(i), None, e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+            if self.errors:
+                raise BatchWriteError(self.errors)
+        return False
@@ -0,0 +1,143 @@
+# The Google Calendar service, built once per token file and shared by the whole
+# process. Credentials are refreshed shortly before they expire rather than by the
+# first request that fails, and the token file is only written when they changed.
+# The Google client libraries are imported on first use, so importing the sync
+# does not pay for them (or for the OAuth consent flow) up front.
+import os
+import pickle
+import datetime
+import threading
+
+TOKEN_PATH = "token.json"
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+# Credentials expiring within this many seconds are refreshed before they are handed out
+REFRESH_MARGIN = 300
+HTTP_TIMEOUT = 60
+
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+class GoogleAuthError(Exception):
+    pass
+
+
+class ThreadHttp:
+    # One authorized, kept-alive httplib2 connection per thread. httplib2 is not
+    # thread-safe, and shard fetches run Calendar requests on several threads.
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.local = threading.local()
+
+    def get(self):
+        http = getattr(self.local, "http", None)
+        if http is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+            http = self.local.http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        return http
+
+
+class GoogleSession:
+    # Credentials and Calendar service of one token file. saved_token is the access
+    # token last written to disk (None when the file is out of date). The session's
+    # lock covers loading, refreshing and authorizing, so a slow token endpoint or
+    # consent flow only holds up callers of the same token file.
+    def __init__(self, token_path):
+        self.token_path = token_path
+        self.credentials = None
+        self.saved_token = None
+        self.service = None
+        self.lock = threading.Lock()
+
+    def build(self, credentials, saved):
+        from googleapiclient.discovery import build
+        from googleapiclient.http import HttpRequest
+        self.credentials = credentials
+        self.saved_token = credentials.token if saved else None
+        self.http = ThreadHttp(credentials)
+        # The discovery document ships with the client library; every request is
+        # built on the calling thread's connection
+        self.service = build(
+            "calendar", "v3", http=self.http.get(), static_discovery=True, cache_discovery=False,
+            requestBuilder=lambda http, *args, **kwargs: HttpRequest(self.http.get(), *args, **kwargs)
+        )
+
+    def get(self, client_info, log, interactive):
+        with self.lock:
+            if self.service is None:
+                creds = load_credentials(self.token_path, log)
+                if creds and (creds.valid or creds.refresh_token):
+                    self.build(creds, saved=True)
+                elif not interactive:
+                    raise GoogleAuthError(f"No usable Google credentials in {self.token_path}; authorize once from the Streamlit app")
+                else:
+                    self.build(authorize(client_info), saved=False)
+                log.write("Google Calendar service initialized")
+            try:
+                self.refresh(log)
+            except Exception as e:
+                # The next call starts over from the token file
+                self.service = None
+                log.write(f"Failed to refresh credentials: {e}")
+                if not interactive:
+                    raise GoogleAuthError(f"Failed to refresh Google credentials: {e}")
+                self.build(authorize(client_info), saved=False)
+                self.save(log)
+            return self.service
+
+    def expires_soon(self, margin=REFRESH_MARGIN):
+        expiry = self.credentials.expiry
+        if not self.credentials.token:
+            return True
+        return expiry is not None and expiry - datetime.datetime.utcnow() < datetime.timedelta(seconds=margin)
+
+    def refresh(self, log, margin=REFRESH_MARGIN):
+        if self.expires_soon(margin):
+            if not self.credentials.refresh_token:
+                raise GoogleAuthError("Google credentials expired and cannot be refreshed")
+            import httplib2
+            from google_auth_httplib2 import Request
+            log.write("Refreshing Google credentials before they expire...")
+            self.credentials.refresh(Request(httplib2.Http(timeout=HTTP_TIMEOUT)))
+            log.write("Credentials refreshed successfully")
+        # Also picks up refreshes the service made on its own during earlier runs
+        self.save(log)
+
+    def save(self, log):
+        if self.credentials.token == self.saved_token:
+            return
+        # Written beside the old file and swapped in, so a crash never leaves half a token
+        tmp_path = f"{self.token_path}.tmp"
+        with open(tmp_path, "wb") as token_file:
+            pickle.dump(self.credentials, token_file)
+        os.replace(tmp_path, self.token_path)
+        self.saved_token = self.credentials.token
+        log.write(f"Saved Google credentials to {self.token_path}")
+
+
+def load_credentials(token_path, log):
+    if not os.path.exists(token_path):
+        return None
+    with open(token_path, "rb") as token_file:
+        try:
+            creds = pickle.load(token_file)
+            log.write(f"Loaded saved Google credentials from {token_path}")
+            return creds
+        except Exception as e:
+            log.write(f"Failed to load {token_path}: {e}")
+            return None
+
+def authorize(client_info):
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    flow = InstalledAppFlow.from_client_config(client_info, SCOPES)
+    return flow.run_local_server(port=8080)
+
+def google_service(client_info, log, interactive=True, token_path=TOKEN_PATH):
+    # The process-wide service for token_path. Headless callers pass
+    # interactive=False: there is no browser for the consent flow.
+    with sessions_lock:
+        session = sessions.get(token_path)
+        if session is None:
+            session = sessions[token_path] = GoogleSession(token_path)
+    return session.get(client_info, log, interactive)
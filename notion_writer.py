@@ -0,0 +1,131 @@
+import time
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import TokenBucket, backoff_delay
+from sync_metrics import null_metrics
+
+# Notion allows an average of three requests per second per integration (API key)
+NOTION_REQUESTS_PER_SECOND = 3.0
+MAX_ATTEMPTS = 6
+RETRYABLE_STATUSES = (500, 502, 503, 504)
+
+# Every API key gets its own bucket, shared by all writers using that key, so a
+# 429 on one integration only pauses that integration. notion_bucket caps all of
+# them together; it is unlimited unless configured, and is the bucket of clients
+# created without a key (the benchmark fakes).
+notion_bucket = TokenBucket(float("inf"))
+notion_key_buckets = {}
+notion_client_buckets = weakref.WeakKeyDictionary()
+notion_buckets_lock = threading.Lock()
+
+
+class NotionWriteError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        details = "; ".join(f"SID={sid}: {err}" for sid, err in errors.items())
+        super().__init__(f"{len(errors)} Notion write(s) failed: {details}")
+
+
+def use_notion_key(client, api_key):
+    # Rate limits the client's calls with the bucket of its API key
+    with notion_buckets_lock:
+        bucket = notion_key_buckets.get(api_key)
+        if bucket is None:
+            bucket = notion_key_buckets[api_key] = TokenBucket(
+                NOTION_REQUESTS_PER_SECOND, capacity=NOTION_REQUESTS_PER_SECOND, parent=notion_bucket)
+        notion_client_buckets[client] = bucket
+    return client
+
+def client_bucket(client):
+    return notion_client_buckets.get(client, notion_bucket)
+
+def retry_after(error):
+    try:
+        return float(error.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def endpoint_name(fn):
+    # "notion.pages.update" for the client's bound endpoint methods
+    owner = getattr(fn, "__self__", None)
+    if owner is None:
+        return f"notion.{getattr(fn, '__name__', 'call')}"
+    return f"notion.{type(owner).__name__.removesuffix('Endpoint').lower()}.{fn.__name__}"
+
+def call_notion(fn, *args, bucket=notion_bucket, metrics=null_metrics, **kwargs):
+    # One rate-limited Notion call: waits on Retry-After for 429s and backs off
+    # with jitter on 5xx responses and timeouts
+    from notion_client.errors import HTTPResponseError, RequestTimeoutError
+    endpoint = endpoint_name(fn)
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            metrics.count("notion_retries")
+        bucket.acquire()
+        try:
+            return metrics.timed(endpoint, fn, *args, **kwargs)
+        except HTTPResponseError as e:
+            if attempt + 1 == MAX_ATTEMPTS:
+                raise
+            if e.status == 429:
+                metrics.count("notion_rate_limited")
+                # Every worker sharing the bucket waits, not just this one
+                bucket.hold(retry_after(e) or backoff_delay(attempt))
+                continue
+            if e.status not in RETRYABLE_STATUSES:
+                raise
+        except RequestTimeoutError:
+            if attempt + 1 == MAX_ATTEMPTS:
+                raise
+        time.sleep(backoff_delay(attempt))
+
+
+class NotionWriter:
+    # Runs Notion page creates/updates on a small worker pool behind the shared
+    # token bucket, so throughput sits at the API limit rather than at single-request
+    # latency. submit() blocks once max_in_flight writes are outstanding.
+    # on_success callbacks run on worker threads and must not touch the UI.
+    # Used as a context manager: exiting waits for every write and raises the
+    # failures, keyed by Shared ID, together.
+    def __init__(self, log, workers=4, max_in_flight=None, bucket=notion_bucket, metrics=null_metrics):
+        self.log = log
+        self.bucket = bucket
+        self.metrics = metrics
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notion-writer")
+        self.slots = threading.BoundedSemaphore(max_in_flight or workers * 2)
+        self.lock = threading.Lock()
+        self.results = {}
+        self.errors = {}
+
+    def submit(self, fn, sid, *args, on_success=None, **kwargs):
+        self.slots.acquire()
+        try:
+            self.pool.submit(self.run, fn, sid, args, kwargs, on_success)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def run(self, fn, sid, args, kwargs, on_success):
+        try:
+            response = call_notion(fn, *args, bucket=self.bucket, metrics=self.metrics, **kwargs)
+            if on_success:
+                on_success(response)
+            with self.lock:
+                self.results[sid] = response
+        except Exception as e:
+            self.metrics.count("notion_write_errors")
+            with self.lock:
+                self.errors[sid] = e
+        finally:
+            self.slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.shutdown(wait=True)
+        for sid, err in self.errors.items():
+            self.log.write(f"   ❌ Notion write failed for SID={sid}: {err}")
+        if exc_type is None and self.errors:
+            raise NotionWriteError(self.errors)
+        return False
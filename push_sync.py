@@ -0,0 +1,220 @@
+import time
+import uuid
+import secrets
+import logging
+import threading
+from gcal_batch import google_bucket
+from sync_metrics import null_metrics
+
+# Calendar keeps a watch channel for at most this long; it is replaced RENEW_MARGIN before it expires
+WATCH_TTL = 7 * 24 * 3600
+RENEW_MARGIN = 3600
+WATCH_CHANNEL_KEY = "watch_channel"
+# A burst of notifications is synced once it has been quiet for DEBOUNCE_SECONDS,
+# or MAX_DELAY_SECONDS after its first notification at the latest
+DEBOUNCE_SECONDS = 2.0
+MAX_DELAY_SECONDS = 30.0
+# Writes a run makes because of Notion edits. The change query always re-reads the
+# last minute, so the number of pages fetched says little about Notion activity.
+NOTION_CHANGE_COUNTERS = ("notion_ids_assigned", "google_edits", "google_creates")
+
+logger = logging.getLogger("notion_gcal_sync")
+
+
+def notion_changed(metrics):
+    return any(metrics.counters.get(name) for name in NOTION_CHANGE_COUNTERS)
+
+
+class SyncTrigger:
+    # Wakes a pair's sync loop for a push notification or when its poll interval
+    # runs out. Notion has no push, so the interval adapts instead: it drops to
+    # min_interval after a run that found Notion changes and doubles (up to
+    # max_interval) after each run that found none.
+    def __init__(self, min_interval, max_interval, debounce=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.cond = threading.Condition()
+        self.pending = 0
+        self.first_at = 0.0
+        self.last_at = 0.0
+        self.stopped = False
+
+    def notify(self):
+        with self.cond:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_at = now
+            self.pending += 1
+            self.last_at = now
+            self.cond.notify_all()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def polled(self, notion_changed):
+        self.interval = self.min_interval if notion_changed else min(self.interval * 2, self.max_interval)
+
+    def wait(self, timeout=None):
+        # Returns the number of notifications coalesced into this wake-up (0 when
+        # the poll interval or timeout ran out), or None once stopped
+        with self.cond:
+            deadline = time.monotonic() + min(self.interval, timeout if timeout is not None else self.interval)
+            while not self.stopped:
+                now = time.monotonic()
+                if self.pending:
+                    due = min(self.last_at + self.debounce, self.first_at + self.max_delay)
+                    if now >= due:
+                        count, self.pending = self.pending, 0
+                        return count
+                    self.cond.wait(due - now)
+                elif now >= deadline:
+                    return 0
+                else:
+                    self.cond.wait(deadline - now)
+            return None
+
+
+class WatchChannel:
+    # The Calendar events.watch channel of one pair. The live channel is kept in
+    # the pair's store, so a daemon restarted after a crash reuses it instead of
+    # piling up channels; a clean shutdown stops it.
+    def __init__(self, service, calendar_id, address, store, log, ttl=WATCH_TTL, metrics=null_metrics):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.address = address
+        self.store = store
+        self.log = log
+        self.ttl = ttl
+        self.metrics = metrics
+        self.channel = store.get_meta(WATCH_CHANNEL_KEY)
+
+    def renew_in(self):
+        if not self.channel:
+            return 0.0
+        return max(0.0, self.channel["expiration"] / 1000 - time.time() - RENEW_MARGIN)
+
+    def wait_timeout(self):
+        # How long the pair may wait before the channel is due for renewal. Once it
+        # is due, this cycle's renewal failed, so it is retried at the next poll
+        # rather than right away.
+        return self.renew_in() or None
+
+    def expired(self):
+        return bool(self.channel) and self.channel["expiration"] / 1000 <= time.time()
+
+    def discard(self):
+        # Forgets a channel Calendar no longer delivers on and returns it
+        channel, self.channel = self.channel, None
+        with self.store.conn:
+            self.store.set_meta(WATCH_CHANNEL_KEY, None)
+        return channel
+
+    def ensure(self):
+        # Returns the live channel and the one it replaced (if any), which the
+        # caller unregisters once the new one is in place
+        current = self.channel
+        if current and current["address"] == self.address and self.renew_in() > 0:
+            return current, None
+        body = {
+            "id": str(uuid.uuid4()),
+            "type": "web_hook",
+            "address": self.address,
+            "token": secrets.token_urlsafe(16),
+            "params": {"ttl": str(int(self.ttl))},
+        }
+        google_bucket.acquire()
+        resp = self.metrics.timed("google.events.watch", self.service.events().watch(
+            calendarId=self.calendar_id, body=body).execute)
+        self.channel = {
+            "id": resp["id"],
+            "resourceId": resp["resourceId"],
+            "expiration": int(resp["expiration"]),
+            "token": body["token"],
+            "address": self.address,
+        }
+        with self.store.conn:
+            self.store.set_meta(WATCH_CHANNEL_KEY, self.channel)
+        self.log.write(f"📡 Watching Google calendar {self.calendar_id} (channel {self.channel['id']})")
+        if current:
+            # Only after the new channel is live, so no change goes unnoticed in between
+            self.stop_channel(current)
+        return self.channel, current
+
+    def stop_channel(self, channel):
+        try:
+            google_bucket.acquire()
+            self.metrics.timed("google.channels.stop", self.service.channels().stop(
+                body={"id": channel["id"], "resourceId": channel["resourceId"]}).execute)
+        except Exception as e:
+            # An expired or unknown channel needs no stopping
+            self.log.write(f"⚠️ Could not stop watch channel {channel['id']}: {e}")
+
+    def stop(self):
+        if self.channel:
+            self.stop_channel(self.channel)
+            self.channel = None
+            with self.store.conn:
+                self.store.set_meta(WATCH_CHANNEL_KEY, None)
+
+
+class WebhookReceiver:
+    # Receives Calendar push notifications and wakes the trigger of the pair whose
+    # channel sent them. Google only posts to HTTPS addresses, so in production
+    # this sits behind a TLS-terminating proxy or tunnel.
+    def __init__(self, host="0.0.0.0", port=8765):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.channels = {}
+        self.lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                receiver.handle(self.headers)
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug("webhook: " + format, *args)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def register(self, channel, trigger):
+        with self.lock:
+            self.channels[channel["id"]] = (channel["token"], trigger)
+
+    def unregister(self, channel):
+        with self.lock:
+            self.channels.pop(channel["id"], None)
+
+    def handle(self, headers):
+        channel_id = headers.get("X-Goog-Channel-ID")
+        state = headers.get("X-Goog-Resource-State")
+        with self.lock:
+            token, trigger = self.channels.get(channel_id, (None, None))
+        if trigger is None or not secrets.compare_digest(headers.get("X-Goog-Channel-Token") or "", token):
+            logger.debug("Ignoring notification for unknown channel %s", channel_id)
+            return
+        # "sync" only confirms a new channel; "exists" and "not_exists" report changes
+        if state != "sync":
+            trigger.notify()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="webhook", daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
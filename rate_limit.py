@@ -0,0 +1,47 @@
+import time
+import random
+import threading
+
+
+class TokenBucket:
+    # Thread-safe token bucket shared by every worker talking to the same API.
+    # hold() pauses all callers, e.g. for the Retry-After of a 429. Tokens are
+    # also taken from parent, an overall cap shared with other buckets, which
+    # hold() leaves alone.
+    def __init__(self, rate, capacity=None, parent=None):
+        self.rate = rate
+        self.parent = parent
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.resume_at and self.tokens >= tokens:
+                    self.tokens -= tokens
+                    break
+                wait = max(self.resume_at - now, (tokens - self.tokens) / self.rate)
+            time.sleep(wait)
+        if self.parent:
+            self.parent.acquire(tokens)
+
+    def set_rate(self, rate, capacity=None):
+        with self.lock:
+            self.rate = rate
+            self.capacity = capacity or max(self.capacity, rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def hold(self, seconds):
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** attempt))
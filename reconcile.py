@@ -0,0 +1,64 @@
+import unicodedata
+
+# Options for the "loose" title matching mode
+LOOSE_NORMALIZATION = {"casefold": True, "collapse_whitespace": True, "unicode_form": "NFKC"}
+
+
+def normalize_title(title, casefold=False, collapse_whitespace=False, unicode_form=None):
+    # The default (strip + lower) is exactly what events_match has always compared
+    title = title or ""
+    if unicode_form:
+        title = unicodedata.normalize(unicode_form, title)
+    if collapse_whitespace:
+        title = " ".join(title.split())
+    title = title.strip()
+    return title.casefold() if casefold else title.lower()
+
+def events_match(t1, d1, t2, d2, **normalize):
+    return normalize_title(t1, **normalize) == normalize_title(t2, **normalize) and d1 == d2
+
+
+class MatchIndex:
+    # Shared IDs and normalized (title, date) keys of both sides, built once per
+    # run so each item is reconciled with a set lookup instead of a full scan.
+    # known (a SyncStore) answers for the linked items that were not fetched this run.
+    def __init__(self, casefold=False, collapse_whitespace=False, unicode_form=None, known=None):
+        self.normalize = {
+            "casefold": casefold,
+            "collapse_whitespace": collapse_whitespace,
+            "unicode_form": unicode_form,
+        }
+        self.notion_sids = set()
+        self.notion_keys = set()
+        self.google_sids = set()
+        self.google_keys = set()
+        self.known = known
+
+    def key(self, title, date):
+        return normalize_title(title, **self.normalize), date
+
+    def add_notion(self, sid, title, date):
+        if sid is not None:
+            self.notion_sids.add(sid)
+        self.notion_keys.add(self.key(title, date))
+
+    def add_google(self, sid, title, date):
+        if sid is not None:
+            self.google_sids.add(sid)
+        self.google_keys.add(self.key(title, date))
+
+    def in_known(self, column, sid, title, date):
+        if self.known is None:
+            return False
+        if sid is not None and self.known.is_linked(sid, column):
+            return True
+        key = self.key(title, date)
+        return any(self.key(known_title, date) == key for known_title in self.known.titles_on(date, column))
+
+    def in_notion(self, sid, title, date):
+        return (sid in self.notion_sids or self.key(title, date) in self.notion_keys
+                or self.in_known("page_id", sid, title, date))
+
+    def in_google(self, sid, title, date):
+        return (sid in self.google_sids or self.key(title, date) in self.google_keys
+                or self.in_known("event_id", sid, title, date))
@@ -0,0 +1,108 @@
+# Compact records holding only what the sync reads from Notion pages and Google
+# events. Fetchers parse each API object once and drop the JSON straight away.
+import json
+import hashlib
+
+# Google events carry their Shared ID in this private extended property; older
+# versions wrote a "SharedID:<id>" token into the description, which is still read
+SHARED_ID_PROPERTY = "notionSyncSharedId"
+# The fields kept in step between a Notion task and its Google event
+SYNCED_FIELDS = ("title", "date")
+# Only the event fields the sync reads are requested (partial responses)
+GOOGLE_EVENT_FIELDS = ("id,status,updated,summary,description,start,end,extendedProperties/private,"
+                       "recurrence,recurringEventId,originalStartTime")
+
+
+def extract_shared_id_from_notion(page):
+    rt = page["properties"].get("Shared ID", {}).get("rich_text", [])
+    return rt[0]["text"]["content"] if rt else None
+
+def extract_description_shared_id(ev):
+    desc = ev.get("description", "") or ""
+    if "SharedID:" not in desc:
+        return None
+    for token in desc.split():
+        if token.startswith("SharedID:"):
+            return token.split("SharedID:")[1]
+    return None
+
+def content_hash(title, date):
+    return hashlib.sha1(json.dumps([title, date]).encode()).hexdigest()[:16]
+
+
+class NotionTask:
+    __slots__ = ("id", "title", "date", "sid", "last_edited_time")
+
+    def __init__(self, id, title, date, sid=None, last_edited_time=None):
+        self.id = id
+        self.title = title
+        self.date = date
+        self.sid = sid
+        self.last_edited_time = last_edited_time
+
+    @classmethod
+    def from_page(cls, page):
+        props = page["properties"]
+        start = (props.get("Due Date", {}).get("date") or {}).get("start")
+        return cls(
+            page["id"],
+            "".join(t["plain_text"] for t in props.get("Task", {}).get("title", [])),
+            start[:10] if start else None,
+            extract_shared_id_from_notion(page),
+            page.get("last_edited_time"),
+        )
+
+    def refresh(self, page):
+        # Takes the values of a pages.create/update response for this page
+        fresh = NotionTask.from_page(page)
+        for name in self.__slots__:
+            setattr(self, name, getattr(fresh, name))
+
+    def content_hash(self):
+        return content_hash(self.title, self.date)
+
+    def __repr__(self):
+        return f"NotionTask({self.id!r}, {self.title!r}, {self.date!r}, sid={self.sid!r})"
+
+
+class GoogleEvent:
+    # start/end are kept as the API's small {"date"} / {"dateTime", "timeZone"} dicts.
+    # tagged is False while the Shared ID is only known from the description.
+    __slots__ = ("id", "status", "title", "date", "start", "end", "sid", "tagged", "updated")
+
+    def __init__(self, id, title, start, end, sid=None, tagged=False, status="confirmed", updated=None):
+        self.id = id
+        self.status = status
+        self.title = title
+        self.start = start
+        self.end = end
+        self.date = start.get("date") or start.get("dateTime", "")[:10]
+        self.sid = sid
+        self.tagged = tagged
+        self.updated = updated
+
+    @classmethod
+    def from_resource(cls, ev):
+        tagged_sid = ev.get("extendedProperties", {}).get("private", {}).get(SHARED_ID_PROPERTY)
+        return cls(
+            ev["id"],
+            ev.get("summary", ""),
+            ev.get("start", {}),
+            ev.get("end", {}),
+            tagged_sid or extract_description_shared_id(ev),
+            bool(tagged_sid),
+            ev.get("status", "confirmed"),
+            ev.get("updated"),
+        )
+
+    def refresh(self, ev):
+        # Takes the values of an events.insert/patch response for this event
+        fresh = GoogleEvent.from_resource(ev)
+        for name in self.__slots__:
+            setattr(self, name, getattr(fresh, name))
+
+    def content_hash(self):
+        return content_hash(self.title, self.date)
+
+    def __repr__(self):
+        return f"GoogleEvent({self.id!r}, {self.title!r}, {self.date!r}, sid={self.sid!r})"
@@ -0,0 +1,98 @@
+# Series mode for recurring Google events. Listed with singleEvents=False, Calendar
+# returns a recurring event once, as its series master (carrying the RRULE), plus
+# the occurrences that were edited or cancelled (exceptions), instead of every
+# occurrence in the window. Only the occurrences inside a short horizon from today
+# are materialized, one Notion task each, and their Shared IDs are derived from the
+# series and the original date, so the Google side needs no write at all.
+import datetime
+from gcal_batch import google_bucket
+from sync_metrics import null_metrics
+from records import GoogleEvent, GOOGLE_EVENT_FIELDS
+
+RECURRENCE_HORIZON_DAYS = 14
+SERIES_SID_PREFIX = "series:"
+INSTANCE_LIST_FIELDS = f"nextPageToken,items({GOOGLE_EVENT_FIELDS})"
+
+
+def occurrence_sid(series_id, original_date):
+    return f"{SERIES_SID_PREFIX}{series_id}:{original_date}"
+
+def is_occurrence_sid(sid):
+    # Occurrences belong to their series and are never created on their own
+    return bool(sid) and sid.startswith(SERIES_SID_PREFIX)
+
+def is_master(ev):
+    return bool(ev.get("recurrence"))
+
+def is_exception(ev):
+    return bool(ev.get("recurringEventId"))
+
+
+class SeriesExpander:
+    # Turns the items of a singleEvents=False listing into records. Masters are
+    # expanded with events.instances (which already applies their exceptions), one
+    # paged call per series limited to the horizon; exceptions of series that were
+    # not expanded are taken as they are.
+    def __init__(self, service, calendar_id, horizon_days=RECURRENCE_HORIZON_DAYS, metrics=null_metrics, today=None):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.metrics = metrics
+        today = today or datetime.datetime.utcnow().date()
+        self.start = datetime.datetime.combine(today, datetime.time())
+        self.end = self.start + datetime.timedelta(days=horizon_days)
+
+    def occurrence(self, ev):
+        # The record of an instance or exception, or None when it is cancelled or
+        # outside the horizon
+        if ev.get("status") == "cancelled":
+            return None
+        record = GoogleEvent.from_resource(ev)
+        if not self.start.date().isoformat() <= record.date < self.end.date().isoformat():
+            return None
+        if not record.sid:
+            original = ev.get("originalStartTime") or ev["start"]
+            record.sid = occurrence_sid(ev["recurringEventId"],
+                                        original.get("date") or original.get("dateTime", "")[:10])
+            record.tagged = True
+        return record
+
+    def instances(self, series_id, start_dt, end_dt):
+        # The occurrences of one series in [start_dt, end_dt) that fall in the horizon
+        tmin, tmax = max(start_dt, self.start), min(end_dt, self.end)
+        if tmin >= tmax:
+            return
+        self.metrics.count("google_series_expanded")
+        params = {"timeMin": tmin.isoformat() + "Z", "timeMax": tmax.isoformat() + "Z",
+                  "maxResults": 250, "fields": INSTANCE_LIST_FIELDS}
+        while True:
+            google_bucket.acquire()
+            resp = self.metrics.timed("google.events.instances", self.service.events().instances(
+                calendarId=self.calendar_id, eventId=series_id, **params).execute)
+            for ev in resp.get("items", []):
+                record = self.occurrence(ev)
+                if record:
+                    yield record
+            if not resp.get("nextPageToken"):
+                return
+            params["pageToken"] = resp["nextPageToken"]
+
+    def expand(self, pages, start_dt, end_dt, masters_only=False):
+        # Records for the listed items: plain events as they are, every series once.
+        # Exceptions wait for the end of the listing, in case their master follows.
+        expanded, exceptions = set(), []
+        for items in pages:
+            for ev in items:
+                if is_master(ev):
+                    if ev["id"] not in expanded and ev.get("status") != "cancelled":
+                        expanded.add(ev["id"])
+                        yield from self.instances(ev["id"], start_dt, end_dt)
+                elif is_exception(ev):
+                    exceptions.append(ev)
+                elif not masters_only:
+                    yield GoogleEvent.from_resource(ev)
+        if not masters_only:
+            for ev in exceptions:
+                if ev["recurringEventId"] not in expanded:
+                    record = self.occurrence(ev)
+                    if record:
+                        yield record
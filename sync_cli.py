@@ -0,0 +1,287 @@
+import os
+import re
+import sys
+import json
+import signal
+import logging
+import argparse
+import datetime
+import threading
+from reconcile import LOOSE_NORMALIZATION
+from gcal_batch import google_bucket
+from notion_writer import notion_bucket
+from sync_metrics import SyncMetrics, write_prometheus_textfile, append_json_line
+from recurrence import RECURRENCE_HORIZON_DAYS
+from push_sync import SyncTrigger, WatchChannel, WebhookReceiver, notion_changed
+from sync_engine import (
+    SETTINGS_PATH, TOKEN_PATH, GOOGLE_CALENDAR_ID, SHARD_DAYS, GoogleAuthError, load_settings, open_store,
+    init_google_client, init_notion_client, run_sync,
+)
+
+PAIRS_PATH = "sync_pairs.json"
+# Pair names end up in state file names (see open_store)
+PAIR_NAME_PATTERN = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._-]*")
+
+# Exit statuses for cron/systemd; with several pairs the highest one is returned
+EXIT_OK = 0
+EXIT_SYNC_FAILED = 1
+EXIT_CONFIG_ERROR = 2
+EXIT_AUTH_ERROR = 3
+
+logger = logging.getLogger("notion_gcal_sync")
+
+
+class ConfigError(Exception):
+    pass
+
+
+class ConsoleLog:
+    # The engine's log interface, backed by the logging module
+    def __init__(self, name=None):
+        self.prefix = f"[{name}] " if name else ""
+
+    def write(self, msg):
+        logger.info("%s%s", self.prefix, msg)
+
+
+class MetricsExport:
+    # Keeps the latest run of every pair so the textfile always covers all of them
+    def __init__(self, textfile=None, jsonl=None):
+        self.textfile = textfile
+        self.jsonl = jsonl
+        self.latest = {}
+        self.lock = threading.Lock()
+
+    def publish(self, metrics):
+        with self.lock:
+            self.latest[metrics.pair] = metrics
+            try:
+                if self.textfile:
+                    write_prometheus_textfile(self.textfile, self.latest.values())
+                if self.jsonl:
+                    append_json_line(self.jsonl, metrics)
+            except OSError as e:
+                logger.warning("Could not write metrics: %s", e)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m sync_cli",
+        description="Run the Notion ↔ Google Calendar sync without the Streamlit UI."
+    )
+    parser.add_argument("--settings", default=SETTINGS_PATH,
+                        help=f"settings file saved by the app (default: {SETTINGS_PATH})")
+    parser.add_argument("--pairs", metavar="PATH",
+                        help=f"sync every database/calendar pair listed in this file (e.g. {PAIRS_PATH}) instead of --settings")
+    parser.add_argument("--max-parallel", type=int, default=None,
+                        help="pairs allowed to sync at the same time (default: all)")
+    parser.add_argument("--days", type=int, default=7, help="days ahead to sync (default: 7)")
+    parser.add_argument("--days-back", type=int, default=0,
+                        help="days in the past to sync as well; long back-fills resume if interrupted (default: 0)")
+    parser.add_argument("--shard-days", type=int, default=SHARD_DAYS,
+                        help=f"days per time shard when listing a whole window (default: {SHARD_DAYS})")
+    parser.add_argument("--series-horizon", type=int, metavar="DAYS",
+                        help="sync recurring events as series, creating tasks only for their occurrences in the "
+                             f"next DAYS days (e.g. {RECURRENCE_HORIZON_DAYS}); by default every occurrence is synced")
+    parser.add_argument("--full", action="store_true", help="fetch the whole window instead of only changes")
+    parser.add_argument("--dry-run", action="store_true", help="log the planned changes without writing anything")
+    parser.add_argument("--loose-matching", action="store_true",
+                        help="ignore repeated whitespace and Unicode/case variants when matching titles")
+    parser.add_argument("--daemon", action="store_true", help="keep running and sync every --interval seconds")
+    parser.add_argument("--interval", type=float, default=300,
+                        help="seconds between daemon cycles; with --watch-url the longest Notion poll interval (default: 300)")
+    parser.add_argument("--watch-url", metavar="URL",
+                        help="public HTTPS address forwarding to --listen; the daemon then syncs on Google Calendar "
+                             "push notifications and polls Notion adaptively")
+    parser.add_argument("--listen", default="0.0.0.0:8765", metavar="HOST:PORT",
+                        help="where the webhook receiver listens (default: 0.0.0.0:8765)")
+    parser.add_argument("--min-interval", type=float, default=30,
+                        help="shortest Notion poll interval with --watch-url, used right after Notion changes (default: 30)")
+    parser.add_argument("--metrics-textfile", metavar="PATH",
+                        help="write the last run's metrics here in Prometheus text format (node_exporter textfile collector)")
+    parser.add_argument("--metrics-jsonl", metavar="PATH", help="append each run's metrics to this JSON lines file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log debug output")
+    return parser.parse_args(argv)
+
+def load_pairs(path):
+    # {"notion_requests_per_second": 3, "google_requests_per_second": 10,
+    #  "pairs": [{"name": "alice", "NOTION_API_KEY": "...", "NOTION_DATABASE_ID": "...",
+    #             "GOOGLE_CALENDAR_ID": "primary", "GOOGLE_TOKEN_PATH": "alice-token.json",
+    #             "days": 7, "days_back": 0, "series_horizon": 14}]}
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"Cannot read {path}: {e}")
+    pairs = config.get("pairs") or []
+    names = set()
+    for pair in pairs:
+        name = pair.get("name")
+        if not name or name in names:
+            raise ConfigError(f"Every pair in {path} needs a unique name (got {name!r})")
+        if not isinstance(name, str) or not PAIR_NAME_PATTERN.fullmatch(name):
+            raise ConfigError(f"Pair name {name!r} in {path} may only use letters, digits, '.', '_' and '-'")
+        if not pair.get("NOTION_API_KEY") or not pair.get("NOTION_DATABASE_ID"):
+            raise ConfigError(f"Pair {name!r} needs NOTION_API_KEY and NOTION_DATABASE_ID")
+        names.add(name)
+    if not pairs:
+        raise ConfigError(f"No pairs listed in {path}")
+    return config, pairs
+
+def settings_pair(path):
+    # The single pair described by the app's settings file (and environment)
+    settings = load_settings(path)
+    pair = {
+        "name": None,
+        "NOTION_API_KEY": os.environ.get("NOTION_API_KEY") or settings.get("NOTION_API_KEY"),
+        "NOTION_DATABASE_ID": os.environ.get("NOTION_DATABASE_ID") or settings.get("NOTION_DATABASE_ID"),
+        "client_info": settings.get("client_info"),
+    }
+    if not pair["NOTION_API_KEY"] or not pair["NOTION_DATABASE_ID"]:
+        raise ConfigError(f"NOTION_API_KEY and NOTION_DATABASE_ID must be set in {path} or the environment")
+    return pair
+
+def watch_calendar(channel, receiver, trigger, log):
+    # Registers or renews the pair's watch channel; on failure the pair just keeps polling
+    try:
+        live, replaced = channel.ensure()
+    except Exception as e:
+        log.write(f"⚠️ Could not watch Google calendar, polling instead: {e}")
+        if channel.expired():
+            receiver.unregister(channel.discard())
+        return
+    receiver.register(live, trigger)
+    if replaced:
+        receiver.unregister(replaced)
+
+def run_pair(pair, args, slots, export, trigger, receiver=None):
+    # One pair's sync loop on its own thread, with its own clients and state file,
+    # so a slow or failing pair never holds up the others
+    name = pair["name"]
+    log = ConsoleLog(name)
+    token_path = pair.get("GOOGLE_TOKEN_PATH", TOKEN_PATH)
+    calendar_id = pair.get("GOOGLE_CALENDAR_ID", GOOGLE_CALENDAR_ID)
+    store = channel = None
+    try:
+        gcal = init_google_client(pair.get("client_info"), log, interactive=False, token_path=token_path)
+        notion = init_notion_client(pair["NOTION_API_KEY"], log)
+        store = open_store(name)
+        if receiver:
+            channel = WatchChannel(gcal, calendar_id, args.watch_url, store, log)
+    except GoogleAuthError as e:
+        logger.error("%s%s", log.prefix, e)
+        return EXIT_AUTH_ERROR
+    except Exception:
+        # The pair cannot start at all, e.g. its state file cannot be opened
+        logger.exception("%s❌ Could not set up the pair", log.prefix)
+        if store:
+            store.close()
+        return EXIT_CONFIG_ERROR
+    status = EXIT_OK
+    try:
+        while True:
+            now = datetime.datetime.utcnow()
+            metrics = SyncMetrics(name)
+            with slots:
+                try:
+                    # The cached service; refreshes the credentials ahead of expiry
+                    gcal = init_google_client(pair.get("client_info"), log, interactive=False, token_path=token_path)
+                    rows = run_sync(notion, gcal, pair["NOTION_DATABASE_ID"],
+                                    now - datetime.timedelta(days=pair.get("days_back", args.days_back)),
+                                    now + datetime.timedelta(days=pair.get("days", args.days)), log,
+                                    incremental=not args.full,
+                                    normalize=LOOSE_NORMALIZATION if args.loose_matching else None,
+                                    store=store,
+                                    calendar_id=calendar_id,
+                                    metrics=metrics, dry_run=args.dry_run, shard_days=args.shard_days,
+                                    series_horizon=pair.get("series_horizon", args.series_horizon))
+                    if not args.dry_run:
+                        log.write(f"✅ Sync complete ({len(rows)} rows updated)")
+                    status = EXIT_OK
+                except Exception:
+                    logger.exception("%s❌ Sync failed", log.prefix)
+                    status = EXIT_SYNC_FAILED
+            export.publish(metrics)
+            if not args.daemon:
+                break
+            trigger.polled(notion_changed(metrics))
+            if channel:
+                watch_calendar(channel, receiver, trigger, log)
+            notified = trigger.wait(channel.wait_timeout() if channel else None)
+            if notified is None:
+                break
+            if notified:
+                log.write(f"📬 {notified} calendar notification(s), syncing")
+    finally:
+        if channel:
+            channel.stop()
+        store.close()
+    return status
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(threadName)s %(message)s"
+    )
+    try:
+        if args.pairs:
+            config, pairs = load_pairs(args.pairs)
+            # Per-API budgets shared by every pair in this process. Notion also limits
+            # each API key on its own, so its budget is only an overall cap.
+            if config.get("notion_requests_per_second"):
+                rate = float(config["notion_requests_per_second"])
+                notion_bucket.set_rate(rate, capacity=rate)
+            if config.get("google_requests_per_second"):
+                google_bucket.set_rate(float(config["google_requests_per_second"]))
+        else:
+            pairs = [settings_pair(args.settings)]
+    except ConfigError as e:
+        logger.error("%s", e)
+        return EXIT_CONFIG_ERROR
+
+    receiver = None
+    if args.watch_url and args.daemon and not args.dry_run:
+        host, _, port = args.listen.rpartition(":")
+        try:
+            receiver = WebhookReceiver(host or "0.0.0.0", int(port)).start()
+        except (OSError, ValueError) as e:
+            logger.error("Cannot listen on %s: %s", args.listen, e)
+            return EXIT_CONFIG_ERROR
+        logger.info("📡 Listening for calendar notifications on port %s", receiver.port)
+    # Without push notifications both sides are polled at the fixed --interval
+    min_interval = args.min_interval if receiver else args.interval
+    triggers = [SyncTrigger(min_interval, args.interval) for _ in pairs]
+
+    def shutdown(*_):
+        for trigger in triggers:
+            trigger.stop()
+
+    if args.daemon:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, shutdown)
+
+    export = MetricsExport(args.metrics_textfile, args.metrics_jsonl)
+    slots = threading.BoundedSemaphore(args.max_parallel or len(pairs))
+    statuses = [EXIT_OK] * len(pairs)
+
+    def worker(i, pair):
+        statuses[i] = run_pair(pair, args, slots, export, triggers[i], receiver)
+
+    threads = [threading.Thread(target=worker, args=(i, pair), name=pair["name"] or "sync", daemon=True)
+               for i, pair in enumerate(pairs)]
+    for t in threads:
+        t.start()
+    # Joined with a timeout so signals still reach the main thread
+    for t in threads:
+        while t.is_alive():
+            t.join(0.5)
+    if receiver:
+        receiver.close()
+    # A daemon that was asked to stop exits cleanly unless a pair could not start at all
+    if args.daemon:
+        return max((s for s in statuses if s != EXIT_SYNC_FAILED), default=EXIT_OK)
+    return max(statuses)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,649 @@
+import os
+import json
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from googleapiclient.errors import HttpError
+from google_service import TOKEN_PATH, GoogleAuthError, google_service
+from gcal_batch import GoogleBatchWriter, BatchWriteError, google_bucket
+from notion_writer import NotionWriter, call_notion, client_bucket, use_notion_key
+from sync_store import SyncStore, STORE_PATH, blank_row
+from sync_plan import SyncPlan, plan_sync
+from sync_metrics import null_metrics
+from recurrence import SeriesExpander
+from records import NotionTask, GoogleEvent, SHARED_ID_PROPERTY, GOOGLE_EVENT_FIELDS
+
+# Whole-file JSON cache and incremental state used before the SQLite store (STORE_PATH);
+# they are imported into the store once and no longer written
+CACHE_PATH = "sync_cache.json"
+STATE_PATH = "sync_state.json"
+SETTINGS_PATH = "sync_settings.json"
+GOOGLE_CALENDAR_ID = "primary"
+GOOGLE_LIST_FIELDS = f"nextPageToken,nextSyncToken,items({GOOGLE_EVENT_FIELDS})"
+NOTION_PROPERTIES = ("Task", "Due Date", "Shared ID")
+notion_property_id_cache = {}
+# Full listings are split into time shards of this many days, fetched FETCH_WORKERS at a time
+SHARD_DAYS = 30
+FETCH_WORKERS = 4
+SHARD_EPOCH = datetime.datetime(1970, 1, 1)
+BACKFILL_CHECKPOINT = "backfill_checkpoint"
+
+
+def load_settings(path=SETTINGS_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def google_shared_id_body(sid):
+    return {"extendedProperties": {"private": {SHARED_ID_PROPERTY: sid}}}
+
+def find_google_event(service, sid, calendar_id=GOOGLE_CALENDAR_ID, metrics=null_metrics):
+    # Looks a linked event up by its Shared ID on the server, wherever it is in the calendar
+    google_bucket.acquire()
+    resp = metrics.timed("google.events.list", service.events().list(
+        calendarId=calendar_id,
+        privateExtendedProperty=f"{SHARED_ID_PROPERTY}={sid}",
+        singleEvents=True,
+        maxResults=1,
+        fields=GOOGLE_LIST_FIELDS
+    ).execute)
+    items = resp.get("items", [])
+    return GoogleEvent.from_resource(items[0]) if items else None
+
+def open_store(name=None):
+    # Each named database/calendar pair keeps its state in its own file
+    if name:
+        root, ext = os.path.splitext(STORE_PATH)
+        return SyncStore(f"{root}.{name}{ext}")
+    return SyncStore(STORE_PATH, json_cache=CACHE_PATH, json_state=STATE_PATH)
+
+def notion_property_ids(notion, db_id, metrics=null_metrics):
+    # IDs of the synced properties, for filter_properties; looked up once per database
+    ids = notion_property_id_cache.get(db_id)
+    if ids is None:
+        db = call_notion(notion.databases.retrieve, database_id=db_id, bucket=client_bucket(notion), metrics=metrics)
+        ids = [db["properties"][name]["id"] for name in NOTION_PROPERTIES if name in db["properties"]]
+        notion_property_id_cache[db_id] = ids
+    return ids
+
+def tag_google_event(ev, sid):
+    ev.sid = sid
+    ev.tagged = True
+
+def migrate_google_shared_ids(service, store, log, calendar_id=GOOGLE_CALENDAR_ID, metrics=null_metrics):
+    # One-time bulk copy of the Shared IDs of every linked event into the extended
+    # property, straight from the store: a batched patch per 50 events, no listing needed
+    if store.get_meta("google_shared_ids_migrated"):
+        return 0
+    links = store.event_links()
+    if links:
+        log.write(f"🔁 Moving the Shared IDs of {len(links)} Google events into extended properties")
+    try:
+        with GoogleBatchWriter(service, log, metrics=metrics) as writer:
+            for sid, event_id in links:
+                writer.add(
+                    service.events().patch(calendarId=calendar_id, eventId=event_id, body=google_shared_id_body(sid),
+                                           fields="id"),
+                    sid
+                )
+    except BatchWriteError as e:
+        # Events deleted since the last run cannot be patched and need no migration
+        if any(getattr(err, "resp", None) is None or err.resp.status not in (404, 410) for err in e.errors.values()):
+            raise
+    metrics.count("google_ids_migrated", len(writer.results))
+    with store.conn:
+        store.set_meta("google_shared_ids_migrated", True)
+    return len(writer.results)
+
+def init_google_client(client_info, log, interactive=True, token_path=TOKEN_PATH):
+    # Cached for the process: later calls only refresh credentials that are about to expire
+    return google_service(client_info, log, interactive, token_path)
+
+def init_notion_client(token, log):
+    from notion_client import Client as NotionClient
+    log.write("🔗 Initializing Notion client")
+    return use_notion_key(NotionClient(auth=token), token)
+
+def iter_google_event_pages(service, calendar_id=GOOGLE_CALENDAR_ID, metrics=null_metrics, **params):
+    # Follows nextPageToken until the listing is exhausted, one page at a time
+    params.setdefault("maxResults", 250)
+    params.setdefault("fields", GOOGLE_LIST_FIELDS)
+    page_token = None
+    while True:
+        if page_token:
+            params["pageToken"] = page_token
+        google_bucket.acquire()
+        resp = metrics.timed("google.events.list", service.events().list(calendarId=calendar_id, **params).execute)
+        yield resp.get("items", [])
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return resp.get("nextSyncToken")
+
+def iter_notion_query_pages(notion, db_id, metrics=null_metrics, **query):
+    # Follows next_cursor until has_more is false, one page at a time
+    query.setdefault("page_size", 100)
+    query.setdefault("filter_properties", notion_property_ids(notion, db_id, metrics))
+    cursor = None
+    while True:
+        if cursor:
+            query["start_cursor"] = cursor
+        resp = call_notion(notion.databases.query, database_id=db_id, bucket=client_bucket(notion), metrics=metrics,
+                           **query)
+        yield resp.get("results", [])
+        cursor = resp.get("next_cursor")
+        if not resp.get("has_more") or not cursor:
+            return
+
+def track_sync_token(pages, state):
+    # Passes pages through and keeps the nextSyncToken of the last one
+    state["google_sync_token"] = yield from pages
+
+def google_records(pages, series=None, start_dt=None, end_dt=None):
+    # Records of the listed pages; in series mode recurring events are expanded by series
+    if series:
+        return series.expand(pages, start_dt, end_dt)
+    return (GoogleEvent.from_resource(ev) for items in pages for ev in items)
+
+class GoogleSyncTokenExpired(Exception):
+    pass
+
+
+def get_google_changes(service, start_dt, end_dt, state, log, calendar_id=GOOGLE_CALENDAR_ID, metrics=null_metrics,
+                       series=None):
+    # Events changed since the stored sync token, plus events that entered the
+    # window since the last run. In series mode also the occurrences that entered
+    # the horizon since the last run. An expired token raises GoogleSyncTokenExpired,
+    # and run_sync back-fills the window instead.
+    tmax = end_dt.isoformat()+"Z"
+    d1, d2 = start_dt.date().isoformat(), tmax[:10]
+    single_events = series is None
+    seen = set()
+    log.write("⏳ Fetching Google changes since last sync")
+    try:
+        pages = iter_google_event_pages(service, calendar_id, metrics, syncToken=state["google_sync_token"],
+                                        singleEvents=single_events)
+        for ev in google_records(track_sync_token(pages, state), series, start_dt, end_dt):
+            if ev.status == "cancelled" or ev.id in seen:
+                continue
+            if d1 <= ev.date <= d2:
+                seen.add(ev.id)
+                yield ev
+    except HttpError as e:
+        if e.resp.status != 410:
+            raise
+        raise GoogleSyncTokenExpired()
+    prev_tmax = state.get("google_window_end")
+    if prev_tmax and prev_tmax < tmax:
+        pages = iter_google_event_pages(service, calendar_id, metrics, timeMin=prev_tmax, timeMax=tmax,
+                                        singleEvents=single_events)
+        for ev in google_records(pages, series, datetime.datetime.fromisoformat(prev_tmax[:-1]), end_dt):
+            if ev.id not in seen:
+                seen.add(ev.id)
+                yield ev
+    prev_horizon = state.get("series_horizon_end")
+    if series and prev_horizon and prev_horizon < series.end.isoformat():
+        # Series whose next occurrences came into the horizon since the last run
+        horizon_start = datetime.datetime.fromisoformat(prev_horizon)
+        pages = iter_google_event_pages(service, calendar_id, metrics, timeMin=prev_horizon + "Z",
+                                        timeMax=series.end.isoformat() + "Z", singleEvents=False)
+        for ev in series.expand(pages, max(start_dt, horizon_start), end_dt, masters_only=True):
+            if ev.id not in seen:
+                seen.add(ev.id)
+                yield ev
+    state["google_window_end"] = tmax
+    state["series_horizon_end"] = series.end.isoformat() if series else None
+    metrics.count("google_events_fetched", len(seen))
+    log.write(f"✅ Retrieved {len(seen)} changed Google events")
+
+def get_notion_changes(notion, db_id, start_dt, end_dt, state, log, metrics=null_metrics):
+    # Tasks edited since the stored watermark, plus tasks that entered the window
+    # since the last run; the whole window when there is no watermark
+    d1 = start_dt.date().isoformat()
+    d2 = end_dt.date().isoformat()
+    window = [
+        {"property":"Due Date","date":{"on_or_after":d1}},
+        {"property":"Due Date","date":{"on_or_before":d2}}
+    ]
+    watermark = state.get("notion_watermark")
+    prev_d2 = state.get("notion_window_end")
+    if watermark:
+        log.write(f"⏳ Fetching Notion tasks edited since {watermark}")
+        changed = [{"timestamp":"last_edited_time","last_edited_time":{"on_or_after":watermark}}]
+        if prev_d2 and prev_d2 < d2:
+            changed.append({"property":"Due Date","date":{"after":prev_d2}})
+        query_filter = {"and": window + [{"or": changed}]}
+    else:
+        log.write(f"⏳ Fetching Notion tasks {d1} → {d2}")
+        query_filter = {"and": window}
+    count = 0
+    for results in iter_notion_query_pages(notion, db_id, metrics, filter=query_filter):
+        for p in results:
+            # last_edited_time is minute-granular, so on_or_after re-reads the boundary minute
+            if not watermark or p["last_edited_time"] > watermark:
+                watermark = p["last_edited_time"]
+            count += 1
+            yield NotionTask.from_page(p)
+    state["notion_watermark"] = watermark
+    state["notion_window_end"] = d2
+    metrics.count("notion_pages_fetched", count)
+    log.write(f"✅ Retrieved {count} changed Notion tasks")
+
+class BufferedLog:
+    # Collects log lines on a worker thread so they can be written from the script thread
+    def __init__(self):
+        self.lines = []
+
+    def write(self, msg):
+        self.lines.append(msg)
+
+def fetch_snapshot(notion, gcal, db_id, start_dt, end_dt, log, state, calendar_id=GOOGLE_CALENDAR_ID,
+                   metrics=null_metrics, series=None):
+    # The fetch phase of an incremental run: the changes since the last run on both
+    # sources are listed in parallel, and every later stage works on (and updates)
+    # these in-memory lists.
+    n_log, g_log = BufferedLog(), BufferedLog()
+
+    def timed_list(phase, items):
+        with metrics.phase(phase):
+            return list(items)
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="fetch") as pool:
+        n_items = get_notion_changes(notion, db_id, start_dt, end_dt, state, n_log, metrics)
+        g_items = get_google_changes(gcal, start_dt, end_dt, state, g_log, calendar_id, metrics, series)
+        n_future = pool.submit(timed_list, "fetch_notion", n_items)
+        g_future = pool.submit(timed_list, "fetch_google", g_items)
+        try:
+            return n_future.result(), g_future.result()
+        finally:
+            for msg in n_log.lines + g_log.lines:
+                log.write(msg)
+
+def window_shards(start_dt, end_dt, shard_days=SHARD_DAYS):
+    # (key, start, end) of each shard of [start_dt, end_dt). Shards are cut at fixed
+    # multiples of shard_days since SHARD_EPOCH, so a date falls into the same shard
+    # on every run and checkpoints stay valid as the window moves.
+    step = datetime.timedelta(days=shard_days)
+    key = (start_dt - SHARD_EPOCH) // step
+    shards = []
+    while start_dt < end_dt:
+        shard_end = min(SHARD_EPOCH + step * (key + 1), end_dt)
+        shards.append((key, start_dt, shard_end))
+        start_dt = shard_end
+        key += 1
+    return shards
+
+def fetch_notion_shard(notion, db_id, start_dt, end_dt, last, metrics=null_metrics):
+    # Tasks due in [start_dt, end_dt), plus those due on end_dt's day for the last shard
+    d1, d2 = start_dt.date().isoformat(), end_dt.date().isoformat()
+    query_filter = {"and": [
+        {"property": "Due Date", "date": {"on_or_after": d1}},
+        {"property": "Due Date", "date": {"on_or_before": d2} if last else {"before": d2}},
+    ]}
+    tasks, watermark = [], None
+    for results in iter_notion_query_pages(notion, db_id, metrics, filter=query_filter):
+        for p in results:
+            if not watermark or p["last_edited_time"] > watermark:
+                watermark = p["last_edited_time"]
+            tasks.append(NotionTask.from_page(p))
+    metrics.count("notion_pages_fetched", len(tasks))
+    return tasks, watermark
+
+def fetch_google_shard(service, start_dt, end_dt, first, last, calendar_id=GOOGLE_CALENDAR_ID, metrics=null_metrics,
+                       series=None):
+    # Inner boundaries are listed with a day of margin and events kept in the shard
+    # of their start date, so an event always lands in the same shard as a task on
+    # that date whatever its time zone
+    d1, d2 = start_dt.date().isoformat(), end_dt.date().isoformat()
+    margin = datetime.timedelta(days=1)
+    tmin = start_dt if first else start_dt - margin
+    tmax = end_dt if last else end_dt + margin
+    events, token_state = [], {}
+    pages = iter_google_event_pages(service, calendar_id, metrics, timeMin=tmin.isoformat() + "Z",
+                                    timeMax=tmax.isoformat() + "Z", singleEvents=series is None)
+    for ev in google_records(track_sync_token(pages, token_state), series, tmin, tmax):
+        if (first or ev.date >= d1) and (last or ev.date < d2):
+            events.append(ev)
+    metrics.count("google_events_fetched", len(events))
+    return events, token_state.get("google_sync_token")
+
+def fetch_shards(notion, gcal, db_id, shards, range_start, range_end, calendar_id=GOOGLE_CALENDAR_ID,
+                 metrics=null_metrics, workers=FETCH_WORKERS, series=None):
+    # Lists both sources of a group of shards in parallel. Returns the records, the
+    # sync token of the Google listing that finished first (the oldest, so no change
+    # after it is missed) and the newest Notion edit time seen. fetch_notion and
+    # fetch_google are the wall time until each side's last shard was listed.
+    notion_tasks, google_events, token, watermark = [], [], None, None
+    started = time.perf_counter()
+
+    def timed(fn, *args):
+        return fn(*args), time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix="shard") as pool:
+        notion_futures = [pool.submit(timed, fetch_notion_shard, notion, db_id, start, end, end == range_end, metrics)
+                          for _, start, end in shards]
+        google_futures = [pool.submit(timed, fetch_google_shard, gcal, start, end, start == range_start,
+                                      end == range_end, calendar_id, metrics, series) for _, start, end in shards]
+        google_done = notion_done = started
+        for future in as_completed(google_futures):
+            (events, shard_token), done = future.result()
+            google_events.extend(events)
+            token = token or shard_token
+            google_done = max(google_done, done)
+        for future in notion_futures:
+            (tasks, shard_watermark), done = future.result()
+            notion_tasks.extend(tasks)
+            if shard_watermark and (not watermark or shard_watermark > watermark):
+                watermark = shard_watermark
+            notion_done = max(notion_done, done)
+    metrics.record_phase("fetch_notion", notion_done - started)
+    metrics.record_phase("fetch_google", google_done - started)
+    return notion_tasks, google_events, token, watermark
+
+def shard_done(checkpoint, shard):
+    key, start, end = shard
+    done = checkpoint["done"].get(str(key))
+    return bool(done) and done[0] <= start.isoformat() and done[1] >= end.isoformat()
+
+def google_date_body(ev, date):
+    # Moves the event to the new date: start and end shift by the same number of
+    # days, so timed events keep their times and length and all-day events their span
+    offset = datetime.date.fromisoformat(date) - datetime.date.fromisoformat(ev.date)
+    raw = ev.start.get("dateTime")
+    if raw:
+        start = datetime.datetime.fromisoformat(raw)
+        end = ev.end.get("dateTime")
+        end = datetime.datetime.fromisoformat(end) if end else start + datetime.timedelta(hours=1)
+        time_zone = ev.start.get("timeZone", "UTC")
+        return {
+            "start": {"dateTime": (start + offset).isoformat(), "timeZone": time_zone},
+            "end":   {"dateTime": (end + offset).isoformat(), "timeZone": ev.end.get("timeZone", time_zone)},
+        }
+    end = ev.end.get("date")
+    end = datetime.date.fromisoformat(end) if end else datetime.date.fromisoformat(ev.date) + datetime.timedelta(days=1)
+    return {
+        "start": {"date": date},
+        "end": {"date": (end + offset).isoformat()},
+    }
+
+def google_edit_body(ev, sid, changes):
+    # A PATCH body carrying only the changed fields
+    body = {}
+    if "title" in changes:
+        body["summary"] = changes["title"]
+    if "date" in changes:
+        body.update(google_date_body(ev, changes["date"]))
+    if not ev.tagged:
+        body.update(google_shared_id_body(sid))
+    return body
+
+def notion_edit_properties(changes):
+    properties = {}
+    if "title" in changes:
+        properties["Task"] = {"title": [{"text": {"content": changes["title"]}}]}
+    if "date" in changes:
+        properties["Due Date"] = {"date": {"start": changes["date"]}}
+    return properties
+
+def resolve_google_event(gcal, sid, event_id, old, log, calendar_id=GOOGLE_CALENDAR_ID, metrics=null_metrics):
+    # The linked event did not change (or is outside the window), fetch it directly
+    ev = None
+    try:
+        google_bucket.acquire()
+        ev = GoogleEvent.from_resource(metrics.timed("google.events.get", gcal.events().get(
+            calendarId=calendar_id, eventId=event_id, fields=GOOGLE_EVENT_FIELDS
+        ).execute))
+    except HttpError as e:
+        if e.resp.status not in (404, 410):
+            raise
+    if ev is None or ev.status == "cancelled":
+        # Gone under its stored ID; it may have been recreated or moved
+        ev = find_google_event(gcal, sid, calendar_id, metrics)
+        if ev is None:
+            log.write(f"   ⚠️ Google event {event_id} no longer exists")
+        else:
+            log.write(f"🚚 Google event moved SID={sid}: {event_id} → {ev.id}")
+            old["event_id"] = ev.id
+    return ev
+
+def execute_plan(plan, notion, gcal, db_id, old_cache, n_tasks, g_events, log, calendar_id=GOOGLE_CALENDAR_ID,
+                 metrics=null_metrics):
+    # Carries out a SyncPlan. Notion writes are queued on the writer pool first so
+    # they run while the Google writes go out in batches on this thread. Successful
+    # writes update the records and stored rows the snapshot is built from; created
+    # pages and events join n_tasks and g_events.
+    for conflict in plan.conflicts:
+        log.write(conflict.describe())
+    metrics.count("edit_conflicts", len(plan.conflicts))
+    for sid, values in plan.merged.items():
+        old_cache.setdefault(sid, blank_row()).update(values)
+    for item in plan.relinks:
+        log.write(item.describe())
+        old_cache.setdefault(item.sid, blank_row())[item.column] = item.new_id
+
+    with NotionWriter(log, bucket=client_bucket(notion), metrics=metrics) as notion_writer, GoogleBatchWriter(gcal, log, metrics=metrics) as writer:
+        for item in plan.notion_ids:
+            log.write(item.describe())
+            metrics.count("notion_ids_assigned")
+            notion_writer.submit(
+                notion.pages.update, item.sid,
+                page_id=item.task.id,
+                properties={"Shared ID": {"rich_text": [{"text": {"content": item.sid}}]}},
+                on_success=lambda _, task=item.task, sid=item.sid: setattr(task, "sid", sid)
+            )
+
+        for item in plan.notion_patches:
+            log.write(item.describe())
+            metrics.count("notion_edits")
+
+            def patched(page, task=item.task, old=old_cache[item.sid]):
+                if task:
+                    # Keep the in-memory task in step so the snapshot records the new values
+                    task.refresh(page)
+                # The stored hash follows our own write, so its echo is not taken for an edit
+                old["notion_hash"] = NotionTask.from_page(page).content_hash()
+
+            notion_writer.submit(
+                notion.pages.update, item.sid,
+                page_id=item.page_id,
+                properties=notion_edit_properties(item.changes),
+                on_success=patched
+            )
+
+        for item in plan.notion_creates:
+            log.write(item.describe())
+            metrics.count("notion_creates")
+            # Created pages join n_tasks so the end-of-run snapshot links them right away
+            notion_writer.submit(notion.pages.create, item.sid, parent={"database_id": db_id}, properties={
+                "Task": {"title": [{"text": {"content": item.title}}]},
+                "Due Date": {"date": {"start": item.date}},
+                "Shared ID": {"rich_text": [{"text": {"content": item.sid}}]}
+            }, on_success=lambda page: n_tasks.append(NotionTask.from_page(page)))
+
+        for item in plan.google_ids:
+            log.write(item.describe())
+            metrics.count("google_ids_migrated" if item.migrating else "google_ids_assigned")
+            writer.add(
+                gcal.events().patch(calendarId=calendar_id, eventId=item.event_id,
+                                    body=google_shared_id_body(item.sid), fields="id"),
+                item.sid,
+                on_success=lambda _, ev=item.event, sid=item.sid: ev and tag_google_event(ev, sid)
+            )
+
+        for item in plan.google_patches:
+            log.write(item.describe())
+            old = old_cache[item.sid]
+            ev = item.event or resolve_google_event(gcal, item.sid, item.event_id, old, log, calendar_id, metrics)
+            changes = {field: value for field, value in item.changes.items() if ev and getattr(ev, field) != value}
+            if not changes:
+                continue
+            metrics.count("google_edits")
+            writer.add(
+                gcal.events().patch(calendarId=calendar_id, eventId=ev.id, body=google_edit_body(ev, item.sid, changes),
+                                    fields=GOOGLE_EVENT_FIELDS),
+                item.sid,
+                on_success=lambda resp, ev=ev, old=old: (
+                    ev.refresh(resp), old.update(google_hash=ev.content_hash()),
+                    log.write(f"   ↪️ Patched Google event {resp['id']}"))
+            )
+
+        for item in plan.google_creates:
+            log.write(item.describe())
+            metrics.count("google_creates")
+            body = {
+                "summary": item.title,
+                "start": {"date": item.date},
+                "end": {"date": (datetime.date.fromisoformat(item.date) + datetime.timedelta(days=1)).isoformat()},
+                **google_shared_id_body(item.sid)
+            }
+            # Created events join g_events so the end-of-run snapshot links them right away
+            writer.add(gcal.events().insert(calendarId=calendar_id, body=body, fields=GOOGLE_EVENT_FIELDS),
+                       item.sid, on_success=lambda ev: g_events.append(GoogleEvent.from_resource(ev)))
+
+def snapshot_rows(old_cache, notion_tasks, google_events):
+    # Linked rows already hold their merged values from the plan; each side only
+    # updates its own link and hash, and new or one-sided rows take the values of
+    # the side they have
+    snapshot = old_cache
+    for task in notion_tasks:
+        entry = snapshot.setdefault(task.sid, blank_row())
+        entry.update({"page_id": task.id, "notion_hash": task.content_hash()})
+        if not entry["event_id"]:
+            entry.update({"title": task.title, "date": task.date})
+    for ev in google_events:
+        entry = snapshot.setdefault(ev.sid, blank_row())
+        entry.update({"event_id": ev.id, "google_hash": ev.content_hash()})
+        if not entry["page_id"]:
+            entry.update({"title": ev.title, "date": ev.date})
+    return snapshot
+
+def run_sync(notion, gcal, db_id, start_dt, end_dt, log, incremental=True, normalize=None, store=None,
+             calendar_id=GOOGLE_CALENDAR_ID, metrics=null_metrics, dry_run=False, shard_days=SHARD_DAYS,
+             fetch_workers=FETCH_WORKERS, series_horizon=None):
+    # One full sync cycle over [start_dt, end_dt], which may reach years into the
+    # past. Returns the stored rows that changed in this run; a dry run logs and
+    # returns the SyncPlan instead and writes nothing.
+    #
+    # An incremental run with a sync token only fetches the changes. Everything
+    # else (the first run, full runs, and the part of a widened window that was
+    # never synced) is back-filled shard group by shard group, newest first: each
+    # group is fetched in parallel, planned, executed and saved, and then marked
+    # done in a checkpoint so a killed back-fill resumes where it stopped.
+    #
+    # With series_horizon (days) recurring events are synced as series: only their
+    # occurrences from today to the horizon are materialized (see recurrence.py).
+    own_store = store is None
+    series = SeriesExpander(gcal, calendar_id, series_horizon, metrics) if series_horizon else None
+    recurrence_mode = "series" if series else "instances"
+    if own_store:
+        store = open_store()
+    plans, rows = SyncPlan(), {}
+
+    def sync_pass(notion_tasks, google_events):
+        with metrics.phase("plan"):
+            # Only the stored rows for this pass's Shared IDs are loaded
+            old_cache = store.load([task.sid for task in notion_tasks] + [ev.sid for ev in google_events])
+            # Items linked to something this pass did not fetch (unchanged, in another
+            # shard or moved out of the window) are known from the store on every run
+            plan = plan_sync(notion_tasks, google_events, old_cache, known=store, normalize=normalize)
+            # Plus the rows the plan links to or retires
+            old_cache.update(store.load({item.sid for item in plan.relinks} - old_cache.keys()))
+        metrics.count("planned_writes", plan.api_writes())
+        plans.extend(plan)
+        if dry_run:
+            return
+        with metrics.phase("execute"):
+            execute_plan(plan, notion, gcal, db_id, old_cache, notion_tasks, google_events, log, calendar_id, metrics)
+        with metrics.phase("snapshot"):
+            snapshot = snapshot_rows(old_cache, notion_tasks, google_events)
+            store.save_run(snapshot)
+        metrics.count("rows_saved", len(snapshot))
+        rows.update(snapshot)
+
+    def backfill(range_start, range_end):
+        shards = window_shards(range_start, range_end, shard_days)
+        checkpoint = store.get_meta(BACKFILL_CHECKPOINT) or {"done": {}}
+        todo = [shard for shard in reversed(shards) if not shard_done(checkpoint, shard)]
+        if len(todo) < len(shards):
+            log.write(f"⏩ Resuming back-fill, {len(shards) - len(todo)} of {len(shards)} shards already done")
+        for i in range(0, len(todo), fetch_workers):
+            group = todo[i:i + fetch_workers]
+            log.write(f"⏳ Back-filling {group[-1][1].date()} → {group[0][2].date()} "
+                      f"(shards {i + 1}-{i + len(group)} of {len(todo)})")
+            with metrics.phase("fetch"):
+                notion_tasks, google_events, token, watermark = fetch_shards(
+                    notion, gcal, db_id, group, range_start, range_end, calendar_id, metrics, fetch_workers, series)
+            log.write(f"✅ Retrieved {len(notion_tasks)} Notion tasks and {len(google_events)} Google events")
+            # Later runs continue from the first group's listings
+            checkpoint.setdefault("google_sync_token", token)
+            checkpoint.setdefault("notion_watermark", watermark)
+            sync_pass(notion_tasks, google_events)
+            metrics.count("shards_synced", len(group))
+            if not dry_run:
+                for key, start, end in group:
+                    checkpoint["done"][str(key)] = [start.isoformat(), end.isoformat()]
+                with store.conn:
+                    store.set_meta(BACKFILL_CHECKPOINT, checkpoint)
+        return checkpoint
+
+    try:
+        with metrics.phase("total"):
+            state = store.load_state() if incremental else None
+            if state and state.get("google_sync_token") and state.get("recurrence_mode", "instances") != recurrence_mode:
+                # Sync tokens only cover listings made the same way
+                log.write(f"🔁 Recurring events are now synced as {recurrence_mode}, listing the whole window again")
+                state["google_sync_token"] = None
+            if not dry_run:
+                with metrics.phase("migrate_ids"):
+                    # Before the fetch, so the migrated events come back already tagged
+                    migrate_google_shared_ids(gcal, store, log, calendar_id, metrics)
+
+            fetched = None
+            if state and state.get("google_sync_token"):
+                try:
+                    with metrics.phase("fetch"):
+                        fetched = fetch_snapshot(notion, gcal, db_id, start_dt, end_dt, log, state, calendar_id,
+                                                 metrics, series)
+                except GoogleSyncTokenExpired:
+                    # Listed again shard by shard, so a long window can resume
+                    log.write("⚠️ Google sync token expired, back-filling the whole window")
+                    state["google_sync_token"] = None
+            if fetched is not None:
+                notion_tasks, google_events = fetched
+                sync_pass(notion_tasks, google_events)
+                covered = state.get("window_start")
+                if covered and start_dt < datetime.datetime.fromisoformat(covered):
+                    # The window now reaches further back than anything synced so far
+                    backfill(start_dt, datetime.datetime.fromisoformat(covered))
+            else:
+                checkpoint = backfill(start_dt, end_dt)
+                if state is not None:
+                    state.update({
+                        "google_sync_token": checkpoint.get("google_sync_token"),
+                        "notion_watermark": checkpoint.get("notion_watermark"),
+                        "google_window_end": end_dt.isoformat() + "Z",
+                        "notion_window_end": end_dt.date().isoformat(),
+                        "series_horizon_end": series.end.isoformat() if series else None,
+                    })
+
+            if dry_run:
+                log.write(f"🧪 Dry run: {plans.api_writes()} writes planned, nothing was changed")
+                for line in plans.describe():
+                    log.write(line)
+                metrics.succeeded = True
+                return plans
+            if state is not None:
+                state["recurrence_mode"] = recurrence_mode
+                covered = state.get("window_start")
+                state["window_start"] = min(covered, start_dt.date().isoformat()) if covered else start_dt.date().isoformat()
+                store.save_run({}, state)
+            with store.conn:
+                store.set_meta(BACKFILL_CHECKPOINT, None)
+        metrics.succeeded = True
+        return rows
+    except Exception:
+        metrics.succeeded = False
+        raise
+    finally:
+        if own_store:
+            store.close()
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+METRIC_PREFIX = "notion_gcal_sync"
+
+
+class SyncMetrics:
+    # Timings and counters of one sync run, recorded from the sync and writer threads.
+    # Phases are wall time; API calls are timed per endpoint, and a Calendar batch
+    # counts as one call (its items are counted separately).
+    def __init__(self, pair=None):
+        self.pair = pair
+        self.started = time.time()
+        self.succeeded = None
+        self.phases = {}
+        self.calls = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def record_phase(self, name, seconds):
+        # For phases timed by the caller, e.g. spread over several threads
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_call(self, endpoint, seconds, error=False):
+        with self.lock:
+            stats = self.calls.setdefault(endpoint, {"count": 0, "seconds": 0.0, "errors": 0})
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["errors"] += int(error)
+
+    def timed(self, endpoint, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_call(endpoint, time.perf_counter() - start, error=True)
+            raise
+        self.record_call(endpoint, time.perf_counter() - start)
+        return result
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "pair": self.pair,
+                "started": self.started,
+                "succeeded": self.succeeded,
+                "phases": dict(self.phases),
+                "calls": {endpoint: dict(stats) for endpoint, stats in self.calls.items()},
+                "counters": dict(self.counters),
+            }
+
+
+class NullMetrics(SyncMetrics):
+    # Default for callers that do not collect metrics
+    def phase(self, name):
+        return nullcontext()
+
+    def record_phase(self, name, seconds):
+        pass
+
+    def record_call(self, endpoint, seconds, error=False):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+
+null_metrics = NullMetrics()
+
+
+def label_set(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    pairs = ",".join(f'{key}="{escape(value)}"' for key, value in labels.items() if value is not None)
+    return f"{{{pairs}}}" if pairs else ""
+
+def prometheus_text(runs):
+    # Latest run of each pair in the Prometheus text exposition format
+    families = {
+        "phase_seconds": ("gauge", "Wall time of each phase of the last sync run"),
+        "api_calls": ("gauge", "API calls made in the last sync run"),
+        "api_call_seconds": ("gauge", "Total latency of the API calls in the last sync run"),
+        "api_call_errors": ("gauge", "API calls that failed in the last sync run"),
+        "items": ("gauge", "Items, writes and retries counted in the last sync run"),
+        "last_run_success": ("gauge", "1 if the last sync run succeeded"),
+        "last_run_timestamp_seconds": ("gauge", "Start time of the last sync run"),
+    }
+    samples = {name: [] for name in families}
+    for run in runs:
+        data = run.as_dict()
+        pair = data["pair"] or "default"
+        for phase, seconds in data["phases"].items():
+            samples["phase_seconds"].append((label_set(pair=pair, phase=phase), seconds))
+        for endpoint, stats in data["calls"].items():
+            labels = label_set(pair=pair, endpoint=endpoint)
+            samples["api_calls"].append((labels, stats["count"]))
+            samples["api_call_seconds"].append((labels, stats["seconds"]))
+            samples["api_call_errors"].append((labels, stats["errors"]))
+        for name, value in data["counters"].items():
+            samples["items"].append((label_set(pair=pair, kind=name), value))
+        samples["last_run_success"].append((label_set(pair=pair), int(bool(data["succeeded"]))))
+        samples["last_run_timestamp_seconds"].append((label_set(pair=pair), data["started"]))
+    lines = []
+    for name, (kind, help_text) in families.items():
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.extend(f"{metric}{labels} {value}" for labels, value in samples[name])
+    return "\n".join(lines) + "\n"
+
+def write_prometheus_textfile(path, runs):
+    # Written to a temporary file and renamed, so the node_exporter textfile
+    # collector never reads a half-written file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text(runs))
+    os.replace(tmp, path)
+
+def append_json_line(path, metrics):
+    with open(path, "a") as f:
+        f.write(json.dumps(metrics.as_dict()) + "\n")
@@ -0,0 +1,292 @@
+# The planning stage of a sync run. From the fetched records and the stored rows
+# it works out every write the run needs without calling any API; the executor in
+# sync_engine carries the plan out, and on its own the plan is a dry run.
+import uuid
+from reconcile import MatchIndex
+from records import SYNCED_FIELDS
+from recurrence import is_occurrence_sid
+
+
+def new_shared_id():
+    return str(uuid.uuid4())
+
+def format_changes(changes):
+    return ", ".join(f"{field}={value!r}" for field, value in changes.items())
+
+def changed_fields(item, old, side_hash):
+    # The synced fields of one side that differ from the last agreed values. A side
+    # whose content hash is unchanged is exactly as the sync last saw or wrote it
+    # (the echo of our own patches included), so it is not compared at all.
+    if item is None or (side_hash and item.content_hash() == side_hash):
+        return {}
+    return {field: getattr(item, field) for field in SYNCED_FIELDS if getattr(item, field) != old[field]}
+
+
+class PlanItem:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+class AssignNotionId(PlanItem):
+    __slots__ = ("task", "sid")
+
+    def describe(self):
+        return f"🔖 Assigning Shared ID to Notion page {self.task.id}: {self.sid}"
+
+
+class AssignGoogleId(PlanItem):
+    # event is None when the event is only known from the store. An event whose
+    # Shared ID was only in its description keeps it (migrating).
+    __slots__ = ("event_id", "sid", "event", "migrating")
+
+    def describe(self):
+        if self.migrating:
+            return f"🔁 Moving Shared ID of Google event {self.event_id} into its extended property: {self.sid}"
+        return f"🔖 Assigning Shared ID to Google event {self.event_id}: {self.sid}"
+
+
+class Relink(PlanItem):
+    # Points the stored row of a Shared ID at another page or event; new_id None unlinks it
+    __slots__ = ("sid", "column", "old_id", "new_id")
+
+    def describe(self):
+        side = "Notion page" if self.column == "page_id" else "Google event"
+        if self.new_id is None:
+            return f"🔗 Unlinking {side} {self.old_id} from SID={self.sid}"
+        if self.old_id is None:
+            return f"🔗 Linking {side} {self.new_id} to SID={self.sid}"
+        return f"🚚 {side} moved SID={self.sid}: {self.old_id} → {self.new_id}"
+
+
+class PatchNotionTask(PlanItem):
+    __slots__ = ("sid", "page_id", "changes", "task")
+
+    def describe(self):
+        return f"✏️ Google edit SID={self.sid}: {format_changes(self.changes)}"
+
+
+class PatchGoogleEvent(PlanItem):
+    # event is None when the linked event was not fetched; the executor looks it up
+    __slots__ = ("sid", "event_id", "changes", "event")
+
+    def describe(self):
+        return f"✏️ Notion edit SID={self.sid}: {format_changes(self.changes)}"
+
+
+class CreateNotionTask(PlanItem):
+    __slots__ = ("sid", "title", "date")
+
+    def describe(self):
+        return f"➕ Creating Notion task {self.title}@{self.date} (SID={self.sid})"
+
+
+class CreateGoogleEvent(PlanItem):
+    __slots__ = ("sid", "title", "date", "task")
+
+    def describe(self):
+        return f"➕ Creating Google event {self.title}@{self.date} (SID={self.sid})"
+
+
+class Conflict(PlanItem):
+    __slots__ = ("sid", "field", "notion_value", "google_value", "winner")
+
+    def describe(self):
+        return (f"⚠️ Conflicting {self.field} edits SID={self.sid}: Notion {self.notion_value!r} vs "
+                f"Google {self.google_value!r}, keeping {self.winner}")
+
+
+class SyncPlan:
+    # Every write of a run, grouped by kind. merged holds the agreed values of the
+    # linked rows that changed; conflicts are informational.
+    KINDS = ("notion_ids", "google_ids", "relinks", "notion_patches", "google_patches",
+             "notion_creates", "google_creates")
+
+    def __init__(self):
+        for kind in self.KINDS:
+            setattr(self, kind, [])
+        self.conflicts = []
+        self.merged = {}
+
+    def extend(self, other):
+        # Adds the items of a plan for another part of the same run
+        for kind in self.KINDS:
+            getattr(self, kind).extend(getattr(other, kind))
+        self.conflicts.extend(other.conflicts)
+        self.merged.update(other.merged)
+
+    def items(self):
+        for kind in self.KINDS:
+            yield from getattr(self, kind)
+
+    def summary(self):
+        return {kind: len(getattr(self, kind)) for kind in self.KINDS}
+
+    def api_writes(self):
+        # Relinks only change the store
+        return sum(len(getattr(self, kind)) for kind in self.KINDS if kind != "relinks")
+
+    def describe(self):
+        for conflict in self.conflicts:
+            yield conflict.describe()
+        for item in self.items():
+            yield item.describe()
+
+    def __len__(self):
+        return sum(self.summary().values())
+
+
+class SyncPlanner:
+    # Builds the plan in four steps: pair unlinked items that match by title and
+    # date, settle the Shared ID of every item, merge the edits of linked pairs,
+    # and create whatever is missing on the other side. known (a SyncStore) stands
+    # in for the items an incremental run did not fetch.
+    def __init__(self, notion_tasks, google_events, old_cache, known=None, normalize=None, new_sid=new_shared_id):
+        self.notion_tasks = notion_tasks
+        self.google_events = google_events
+        self.old_cache = old_cache
+        self.known = known
+        self.normalize = normalize or {}
+        self.new_sid = new_sid
+        self.plan = SyncPlan()
+        # Shared IDs as they will be once the plan has run, by page and event id
+        self.notion_sid = {task.id: task.sid for task in notion_tasks}
+        self.google_sid = {ev.id: ev.sid for ev in google_events}
+        self.notion_sids = {task.sid for task in notion_tasks if task.sid}
+        self.google_sids = {ev.sid for ev in google_events if ev.sid}
+
+    def has_notion(self, sid):
+        return sid in self.notion_sids or (self.known is not None and self.known.is_linked(sid, "page_id"))
+
+    def has_google(self, sid):
+        return sid in self.google_sids or (self.known is not None and self.known.is_linked(sid, "event_id"))
+
+    def build(self):
+        self.pair_matches()
+        self.assign_ids()
+        self.plan_edits()
+        self.plan_creates()
+        return self.plan
+
+    def pair_matches(self):
+        # A task and an event that match by title and date but carry different (or
+        # no) Shared IDs become one pair under a single ID, so later edits follow
+        # each other instead of creating duplicates
+        key = MatchIndex(**self.normalize).key
+        waiting = {}
+        for ev in self.google_events:
+            if ev.title.strip() and ev.date and not (ev.sid and self.has_notion(ev.sid)):
+                waiting.setdefault(key(ev.title, ev.date), []).append(ev)
+        claimed = set()
+        for task in self.notion_tasks:
+            if not task.title or not task.date or (task.sid and self.has_google(task.sid)):
+                continue
+            matches = waiting.get(key(task.title, task.date))
+            if matches:
+                ev = matches.pop(0)
+                sid = task.sid or ev.sid or self.new_sid()
+                self.notion_sid[task.id] = self.google_sid[ev.id] = sid
+                self.plan.merged[sid] = {"title": task.title, "date": task.date}
+                if ev.sid and ev.sid != sid:
+                    self.plan.relinks.append(Relink(ev.sid, "event_id", ev.id, None))
+            elif self.known is not None:
+                self.pair_stored(task, True, key, claimed)
+        if self.known is not None:
+            for matches in waiting.values():
+                for ev in matches:
+                    self.pair_stored(ev, False, key, claimed)
+
+    def pair_stored(self, item, is_task, key, claimed):
+        # Incremental runs: the counterpart may be a stored, still unlinked item that
+        # was not fetched this time
+        for row_sid, title, other_id in self.known.unlinked_on(item.date, "event_id" if is_task else "page_id"):
+            if row_sid in claimed or key(title, item.date) != key(item.title, item.date):
+                continue
+            claimed.add(row_sid)
+            if is_task:
+                # The stored event takes the task's Shared ID
+                sid = item.sid or row_sid
+                self.notion_sid[item.id] = sid
+                if sid != row_sid:
+                    self.plan.google_ids.append(AssignGoogleId(other_id, sid, None, False))
+                    self.plan.relinks.append(Relink(row_sid, "event_id", other_id, None))
+                self.plan.relinks.append(Relink(sid, "event_id", None, other_id))
+            else:
+                # The event takes the stored page's Shared ID
+                sid = row_sid
+                self.google_sid[item.id] = sid
+                if item.sid and item.sid != sid:
+                    self.plan.relinks.append(Relink(item.sid, "event_id", item.id, None))
+                self.plan.relinks.append(Relink(sid, "event_id", None, item.id))
+            self.plan.merged[sid] = {"title": item.title.strip(), "date": item.date}
+            return
+
+    def assign_ids(self):
+        for task in self.notion_tasks:
+            sid = self.notion_sid[task.id] or self.new_sid()
+            self.notion_sid[task.id] = sid
+            if task.sid != sid:
+                self.plan.notion_ids.append(AssignNotionId(task, sid))
+        for ev in self.google_events:
+            sid = self.google_sid[ev.id] or self.new_sid()
+            self.google_sid[ev.id] = sid
+            if ev.sid != sid or not ev.tagged:
+                self.plan.google_ids.append(AssignGoogleId(ev.id, sid, ev, ev.sid == sid))
+
+    def plan_edits(self):
+        notion_by_sid = {self.notion_sid[task.id]: task for task in self.notion_tasks}
+        google_by_sid = {self.google_sid[ev.id]: ev for ev in self.google_events}
+        for sid, old in self.old_cache.items():
+            task, ev = notion_by_sid.get(sid), google_by_sid.get(sid)
+            if task and old.get("page_id") and task.id != old["page_id"]:
+                self.plan.relinks.append(Relink(sid, "page_id", old["page_id"], task.id))
+            if ev and old.get("event_id") and ev.id != old["event_id"]:
+                self.plan.relinks.append(Relink(sid, "event_id", old["event_id"], ev.id))
+            if old.get("page_id") and old.get("event_id"):
+                self.merge(sid, old, task, ev)
+
+    def merge(self, sid, old, task, ev):
+        # Field-level three-way merge of one linked pair against the stored values
+        n_changes = changed_fields(task, old, old.get("notion_hash"))
+        g_changes = changed_fields(ev, old, old.get("google_hash"))
+        if not n_changes and not g_changes:
+            return
+        for field in n_changes.keys() & g_changes.keys():
+            if n_changes[field] != g_changes[field]:
+                # Both sides changed the field: the later edit wins, Notion on a tie
+                notion_wins = not (ev.updated and task.last_edited_time) or task.last_edited_time >= ev.updated
+                self.plan.conflicts.append(Conflict(sid, field, n_changes[field], g_changes[field],
+                                                    "Notion" if notion_wins else "Google"))
+                del (g_changes if notion_wins else n_changes)[field]
+        self.plan.merged[sid] = {**g_changes, **n_changes}
+        to_google = {field: value for field, value in n_changes.items() if ev is None or getattr(ev, field) != value}
+        to_notion = {field: value for field, value in g_changes.items() if task is None or getattr(task, field) != value}
+        if to_google:
+            self.plan.google_patches.append(PatchGoogleEvent(sid, ev.id if ev else old["event_id"], to_google, ev))
+        if to_notion:
+            self.plan.notion_patches.append(PatchNotionTask(sid, task.id if task else old["page_id"], to_notion, task))
+
+    def plan_creates(self):
+        index = MatchIndex(known=self.known, **self.normalize)
+        for task in self.notion_tasks:
+            index.add_notion(self.notion_sid[task.id], task.title, task.date)
+        for ev in self.google_events:
+            index.add_google(self.google_sid[ev.id], ev.title, ev.date)
+        for ev in self.google_events:
+            sid, title, date = self.google_sid[ev.id], ev.title.strip(), ev.date
+            if title and date and not index.in_notion(sid, title, date):
+                self.plan.notion_creates.append(CreateNotionTask(sid, title, date))
+        for task in self.notion_tasks:
+            sid, title, date = self.notion_sid[task.id], task.title, task.date
+            # A task of a recurring occurrence outlives the occurrence's horizon; its series still exists
+            if title and date and not is_occurrence_sid(sid) and not index.in_google(sid, title, date):
+                self.plan.google_creates.append(CreateGoogleEvent(sid, title, date, task))
+
+
+def plan_sync(notion_tasks, google_events, old_cache, known=None, normalize=None, new_sid=new_shared_id):
+    return SyncPlanner(notion_tasks, google_events, old_cache, known, normalize, new_sid).build()
@@ -0,0 +1,146 @@
+import os
+import json
+import sqlite3
+
+STORE_PATH = "sync_state.db"
+LINK_COLUMNS = ("page_id", "event_id")
+# Columns added after the first release, created on open for older databases
+ADDED_COLUMNS = {"notion_hash": "TEXT", "google_hash": "TEXT"}
+ROW_COLUMNS = ("title", "date", "page_id", "event_id", "notion_hash", "google_hash")
+# SQLite's default limit on bound parameters per statement
+MAX_VARIABLES = 999
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    sid         TEXT PRIMARY KEY NOT NULL,
+    title       TEXT,
+    date        TEXT,
+    page_id     TEXT,
+    event_id    TEXT,
+    notion_hash TEXT,
+    google_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS links_page_id ON links (page_id);
+CREATE INDEX IF NOT EXISTS links_event_id ON links (event_id);
+CREATE INDEX IF NOT EXISTS links_date ON links (date);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY NOT NULL,
+    value TEXT
+);
+"""
+
+
+def blank_row():
+    return dict.fromkeys(ROW_COLUMNS)
+
+
+class SyncStore:
+    # Last-known synced state per Shared ID plus the incremental sync state
+    # (sync token, watermarks). Rows are read and upserted per Shared ID, so a run
+    # only touches its change set. WAL mode lets a UI read while a sync writes.
+    # title/date are the last values both sides agreed on; notion_hash/google_hash
+    # are content hashes of each side as the sync last saw or wrote it.
+    def __init__(self, path=STORE_PATH, json_cache=None, json_state=None):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.add_columns()
+        self.migrate_json(json_cache, json_state)
+
+    def add_columns(self):
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(links)")}
+        with self.conn:
+            for column, kind in ADDED_COLUMNS.items():
+                if column not in existing:
+                    self.conn.execute(f"ALTER TABLE links ADD COLUMN {column} {kind}")
+
+    def migrate_json(self, json_cache, json_state):
+        # One-time import of the old whole-file JSON cache and state
+        if self.get_meta("json_migrated"):
+            return
+        rows = {}
+        if json_cache and os.path.exists(json_cache):
+            with open(json_cache) as f:
+                rows = json.load(f)
+            # The old app cached items without a Shared ID under None, which JSON wrote as "null"
+            rows.pop("null", None)
+        state = {}
+        if json_state and os.path.exists(json_state):
+            with open(json_state) as f:
+                state = json.load(f)
+        self.save_run(rows, state)
+        with self.conn:
+            self.set_meta("json_migrated", True)
+
+    def load(self, sids):
+        # Rows for the given Shared IDs only, as
+        # {sid: {"title", "date", "page_id", "event_id", "notion_hash", "google_hash"}}
+        sids = [sid for sid in set(sids) if sid is not None]
+        rows = {}
+        for i in range(0, len(sids), MAX_VARIABLES):
+            chunk = sids[i:i + MAX_VARIABLES]
+            cur = self.conn.execute(
+                "SELECT sid, title, date, page_id, event_id, notion_hash, google_hash FROM links "
+                f"WHERE sid IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for sid, title, date, page_id, event_id, notion_hash, google_hash in cur:
+                rows[sid] = {"title": title, "date": date, "page_id": page_id, "event_id": event_id,
+                             "notion_hash": notion_hash, "google_hash": google_hash}
+        return rows
+
+    def is_linked(self, sid, column):
+        assert column in LINK_COLUMNS
+        cur = self.conn.execute(f"SELECT 1 FROM links WHERE sid = ? AND {column} IS NOT NULL", (sid,))
+        return cur.fetchone() is not None
+
+    def titles_on(self, date, column):
+        assert column in LINK_COLUMNS
+        cur = self.conn.execute(f"SELECT title FROM links WHERE date = ? AND {column} IS NOT NULL", (date,))
+        return [title for (title,) in cur]
+
+    def unlinked_on(self, date, column):
+        # (sid, title, id) of the rows on this date linked on one side only
+        assert column in LINK_COLUMNS
+        other = "event_id" if column == "page_id" else "page_id"
+        return self.conn.execute(
+            f"SELECT sid, title, {column} FROM links WHERE date = ? AND {column} IS NOT NULL AND {other} IS NULL",
+            (date,)
+        ).fetchall()
+
+    def event_links(self):
+        return self.conn.execute("SELECT sid, event_id FROM links WHERE event_id IS NOT NULL").fetchall()
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value))
+        )
+
+    def load_state(self):
+        return self.get_meta("sync_state", {})
+
+    def save_run(self, rows, state=None):
+        # Upserts the changed rows (and the new sync state) in one transaction
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO links (sid, title, date, page_id, event_id, notion_hash, google_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(sid) DO UPDATE SET title = excluded.title, date = excluded.date, "
+                "page_id = excluded.page_id, event_id = excluded.event_id, "
+                "notion_hash = excluded.notion_hash, google_hash = excluded.google_hash",
+                [(sid, r.get("title"), r.get("date"), r.get("page_id"), r.get("event_id"),
+                  r.get("notion_hash"), r.get("google_hash"))
+                 for sid, r in rows.items() if sid is not None]
+            )
+            if state is not None:
+                self.set_meta("sync_state", state)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,56 @@
+# Runs a sync on a background thread so the Streamlit script thread stays free.
+# The page polls the worker for progress instead of blocking on run_sync, and the
+# worker never touches Streamlit itself.
+import threading
+from collections import deque
+
+# Lines kept for display; older ones are dropped, the count of all lines is kept
+LOG_LIMIT = 500
+
+
+class LogBuffer:
+    # The engine's log interface as a bounded, append-only buffer that the worker
+    # writes and the page reads
+    def __init__(self, limit=LOG_LIMIT):
+        self.lines = deque(maxlen=limit)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def write(self, msg):
+        with self.lock:
+            self.lines.append(msg)
+            self.total += 1
+
+    def snapshot(self):
+        # The retained lines and how many older ones were dropped
+        with self.lock:
+            return list(self.lines), self.total - len(self.lines)
+
+
+class SyncWorker:
+    # One sync run: target(log) is called on a daemon thread and its result or
+    # exception kept for the page to show once done is set
+    def __init__(self, target, log, metrics):
+        self.log = log
+        self.metrics = metrics
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(target,), name="sync-worker", daemon=True)
+
+    def run(self, target):
+        try:
+            self.result = target(self.log)
+        except Exception as e:
+            self.error = e
+            self.log.write(f"❌ Sync error: {e}")
+        finally:
+            self.done.set()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    @property
+    def running(self):
+        return self.thread.is_alive() and not self.done.is_set()
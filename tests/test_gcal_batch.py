@@ -0,0 +1,91 @@
+# Unit tests for GoogleBatchWriter's retries against the fake Calendar of
+# benchmarks/fake_apis.py, with backoff delays cut to nothing. Run from the
+# repository root:
+#   python -m pytest tests
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+import gcal_batch
+from fake_apis import FakeBatch, FakeCalendar, google_error
+from gcal_batch import MAX_ATTEMPTS, BatchWriteError, GoogleBatchWriter
+from rate_limit import TokenBucket
+from sync_metrics import SyncMetrics
+
+CALENDAR_ID = "primary"
+
+
+class NullLog:
+    def write(self, msg):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(gcal_batch, "backoff_delay", lambda attempt: 0)
+
+def failing_batches(monkeypatch, status, times):
+    # The next `times` batch requests fail as a whole with `status`
+    execute, calls = FakeBatch.execute, []
+
+    def fail(self):
+        calls.append(len(self.requests))
+        if len(calls) <= times:
+            raise google_error(status, "backendError", "Backend Error")
+        return execute(self)
+
+    monkeypatch.setattr(FakeBatch, "execute", fail)
+    return calls
+
+def write_events(gcal, n, metrics):
+    writer = GoogleBatchWriter(gcal, NullLog(), bucket=TokenBucket(1e9), metrics=metrics)
+    created = []
+    with writer:
+        for i in range(n):
+            writer.add(gcal.events().insert(calendarId=CALENDAR_ID, body={
+                "summary": f"Event {i}", "start": {"date": "2025-03-10"}, "end": {"date": "2025-03-11"}}),
+                f"sid-{i}", on_success=created.append)
+    return writer, created
+
+
+def test_rate_limited_items_are_retried():
+    gcal, metrics = FakeCalendar(rate_limit_every=7), SyncMetrics()
+    writer, created = write_events(gcal, 120, metrics)
+    assert sorted(writer.results) == sorted(f"sid-{i}" for i in range(120))
+    assert len(created) == len(gcal.store) == 120
+    assert metrics.counters["google_retries"] == metrics.counters["google_rate_limited"] > 0
+    assert not writer.errors
+
+def test_failed_batch_request_is_retried(monkeypatch):
+    calls = failing_batches(monkeypatch, 503, 1)
+    gcal, metrics = FakeCalendar(), SyncMetrics()
+    writer, _ = write_events(gcal, 120, metrics)
+    assert len(writer.results) == len(gcal.store) == 120
+    # Three chunks of at most 50; the first chunk's 50 items are sent again
+    assert calls == [50, 50, 20, 50]
+    assert metrics.counters["google_retries"] == 50
+    assert "google_rate_limited" not in metrics.counters
+
+def test_writer_gives_up_after_max_attempts(monkeypatch):
+    calls = failing_batches(monkeypatch, 503, 1000)
+    gcal, metrics = FakeCalendar(), SyncMetrics()
+    with pytest.raises(BatchWriteError) as raised:
+        write_events(gcal, 3, metrics)
+    assert len(calls) == MAX_ATTEMPTS
+    assert sorted(raised.value.errors) == ["sid-0", "sid-1", "sid-2"]
+    assert all(err.resp.status == 503 for err in raised.value.errors.values())
+    assert metrics.counters["google_write_errors"] == 3
+    assert not gcal.store
+
+def test_errors_that_cannot_succeed_are_not_retried():
+    gcal, metrics = FakeCalendar(), SyncMetrics()
+    writer = GoogleBatchWriter(gcal, NullLog(), bucket=TokenBucket(1e9), metrics=metrics)
+    with pytest.raises(BatchWriteError) as raised:
+        with writer:
+            writer.add(gcal.events().patch(calendarId=CALENDAR_ID, eventId="missing", body={"summary": "x"}), "sid-x")
+    assert list(raised.value.errors) == ["sid-x"]
+    assert raised.value.errors["sid-x"].resp.status == 404
+    assert "google_retries" not in metrics.counters
@@ -0,0 +1,134 @@
+# Unit tests for push-triggered syncing: the trigger's coalescing and the watch
+# channel's renewal failures, with short intervals and stubs for Calendar.
+# Run from the repository root:
+#   python -m pytest tests
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from push_sync import RENEW_MARGIN, WATCH_CHANNEL_KEY, SyncTrigger, WatchChannel
+from sync_cli import watch_calendar
+from sync_store import SyncStore
+
+
+class NullLog:
+    def write(self, msg):
+        pass
+
+
+class FailingCalendar:
+    # events().watch(...).execute() raises, as for a 5xx or an unverified domain
+    def __init__(self):
+        self.watch_calls = 0
+
+    def events(self):
+        return self
+
+    def watch(self, calendarId, body):
+        self.watch_calls += 1
+        return self
+
+    def execute(self):
+        raise RuntimeError("backend error")
+
+
+class Receiver:
+    def __init__(self):
+        self.channels = {}
+
+    def register(self, channel, trigger):
+        self.channels[channel["id"]] = trigger
+
+    def unregister(self, channel):
+        self.channels.pop(channel["id"], None)
+
+
+def notify_later(trigger, *delays):
+    def run():
+        for delay in delays:
+            time.sleep(delay)
+            trigger.notify()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def stored_channel(expires_in):
+    return {"id": "channel-1", "resourceId": "resource-1", "expiration": int((time.time() + expires_in) * 1000),
+            "token": "token", "address": "https://example.com/hook"}
+
+def watch_channel(tmp_path, expires_in):
+    store = SyncStore(str(tmp_path / "state.db"))
+    with store.conn:
+        store.set_meta(WATCH_CHANNEL_KEY, stored_channel(expires_in))
+    return WatchChannel(FailingCalendar(), "primary", "https://example.com/hook", store, NullLog()), store
+
+
+def test_poll_interval_runs_out_without_notifications():
+    trigger = SyncTrigger(0.05, 1.0)
+    start = time.monotonic()
+    assert trigger.wait() == 0
+    assert 0.04 <= time.monotonic() - start < 0.5
+
+def test_burst_is_coalesced_after_it_goes_quiet():
+    trigger = SyncTrigger(5.0, 5.0, debounce=0.1, max_delay=5.0)
+    thread = notify_later(trigger, 0, 0.02, 0.02, 0.02)
+    start = time.monotonic()
+    assert trigger.wait() == 4
+    # The last notification plus the quiet time, well before the poll interval
+    assert 0.15 <= time.monotonic() - start < 1.0
+    thread.join()
+
+def test_steady_notifications_are_synced_by_max_delay():
+    trigger = SyncTrigger(5.0, 5.0, debounce=0.1, max_delay=0.3)
+    thread = notify_later(trigger, *[0.05] * 12)
+    start = time.monotonic()
+    count = trigger.wait()
+    elapsed = time.monotonic() - start
+    thread.join()
+    # Never quiet for the debounce time, so max_delay after the first one ends the wait
+    assert 0.3 <= elapsed < 1.0
+    assert 3 <= count < 12
+
+def test_stop_ends_the_wait():
+    trigger = SyncTrigger(5.0, 5.0)
+    threading.Timer(0.05, trigger.stop).start()
+    assert trigger.wait() is None
+
+def test_poll_interval_adapts_to_notion_changes():
+    trigger = SyncTrigger(1.0, 5.0)
+    intervals = []
+    for changed in (False, False, False, True):
+        trigger.polled(changed)
+        intervals.append(trigger.interval)
+    assert intervals == [2.0, 4.0, 5.0, 1.0]
+
+def test_failed_renewal_waits_for_the_poll_interval(tmp_path):
+    # The channel is inside its renewal margin but still delivering
+    channel, store = watch_channel(tmp_path, RENEW_MARGIN / 2)
+    receiver, trigger = Receiver(), SyncTrigger(0.05, 0.05)
+    receiver.register(channel.channel, trigger)
+    watch_calendar(channel, receiver, trigger, NullLog())
+    assert channel.service.watch_calls == 1
+    assert "channel-1" in receiver.channels
+    assert channel.wait_timeout() is None
+    start = time.monotonic()
+    assert trigger.wait(channel.wait_timeout()) == 0
+    assert time.monotonic() - start >= 0.04
+    store.close()
+
+def test_failed_renewal_drops_an_expired_channel(tmp_path):
+    channel, store = watch_channel(tmp_path, -60)
+    receiver, trigger = Receiver(), SyncTrigger(0.05, 0.05)
+    receiver.register(channel.channel, trigger)
+    watch_calendar(channel, receiver, trigger, NullLog())
+    assert channel.channel is None and not receiver.channels
+    assert store.get_meta(WATCH_CHANNEL_KEY) is None
+    assert channel.wait_timeout() is None
+    store.close()
+
+def test_live_channel_sets_the_wait(tmp_path):
+    channel, store = watch_channel(tmp_path, RENEW_MARGIN + 120)
+    assert 100 < channel.wait_timeout() <= 120
+    store.close()
@@ -0,0 +1,57 @@
+# Unit tests for the shared token buckets and the per-API-key Notion buckets.
+# Run from the repository root:
+#   python -m pytest tests
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rate_limit import TokenBucket
+from notion_writer import use_notion_key, client_bucket, notion_bucket
+
+
+class Client:
+    pass
+
+
+def test_bucket_spends_its_burst_then_waits_for_the_rate():
+    bucket = TokenBucket(20, capacity=2)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    assert 0.08 <= time.monotonic() - start < 0.5
+
+def test_hold_pauses_only_its_own_bucket():
+    parent = TokenBucket(float("inf"))
+    first, second = TokenBucket(100, parent=parent), TokenBucket(100, parent=parent)
+    first.hold(5)
+    start = time.monotonic()
+    second.acquire()
+    parent.acquire()
+    assert time.monotonic() - start < 0.1
+
+def test_parent_caps_its_children_together():
+    parent = TokenBucket(20, capacity=1)
+    first, second = TokenBucket(1000, parent=parent), TokenBucket(1000, parent=parent)
+    start = time.monotonic()
+    for _ in range(2):
+        first.acquire()
+        second.acquire()
+    assert time.monotonic() - start >= 0.14
+
+def test_each_notion_key_has_its_own_bucket():
+    work, team, work_again = Client(), Client(), Client()
+    use_notion_key(work, "test-key-work")
+    use_notion_key(team, "test-key-team")
+    use_notion_key(work_again, "test-key-work")
+    assert client_bucket(work) is client_bucket(work_again)
+    assert client_bucket(work) is not client_bucket(team)
+    assert client_bucket(work).parent is notion_bucket
+    # A 429 on one integration leaves the other one running
+    client_bucket(team).hold(5)
+    start = time.monotonic()
+    client_bucket(work).acquire()
+    assert time.monotonic() - start < 0.1
+
+def test_clients_without_a_key_use_the_overall_bucket():
+    assert client_bucket(Client()) is notion_bucket
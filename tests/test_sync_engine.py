@@ -0,0 +1,144 @@
+# Unit tests for the engine: request bodies the executor builds, and whole runs
+# against the in-process fakes of benchmarks/fake_apis.py. Run from the repository root:
+#   python -m pytest tests
+import os
+import sys
+import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+from fake_apis import FakeNotion, FakeCalendar
+from gcal_batch import google_bucket
+from notion_writer import notion_bucket
+from records import GoogleEvent
+from sync_engine import SHARD_EPOCH, google_date_body, run_sync, shard_done, window_shards
+from sync_metrics import SyncMetrics
+from sync_store import SyncStore
+
+DATABASE_ID = "test-database"
+CALENDAR_ID = "primary"
+
+
+class NullLog:
+    def write(self, msg):
+        pass
+
+
+def unlimited():
+    notion_bucket.set_rate(1e9)
+    google_bucket.set_rate(1e9)
+
+def notion_titles(notion):
+    return sorted("".join(t["plain_text"] for t in page["properties"]["Task"]["title"])
+                  for page in notion.store.values())
+
+
+def test_timed_event_keeps_its_times_and_length():
+    ev = GoogleEvent("event-1", "Review", {"dateTime": "2025-03-10T15:30:00-05:00", "timeZone": "America/New_York"},
+                     {"dateTime": "2025-03-10T17:00:00-05:00", "timeZone": "America/New_York"})
+    assert google_date_body(ev, "2025-03-14") == {
+        "start": {"dateTime": "2025-03-14T15:30:00-05:00", "timeZone": "America/New_York"},
+        "end":   {"dateTime": "2025-03-14T17:00:00-05:00", "timeZone": "America/New_York"},
+    }
+
+def test_timed_event_past_midnight_keeps_its_end_day():
+    ev = GoogleEvent("event-1", "Late", {"dateTime": "2025-03-10T23:30:00+00:00"}, {"dateTime": "2025-03-11T01:00:00+00:00"})
+    body = google_date_body(ev, "2025-03-01")
+    assert body["start"]["dateTime"] == "2025-03-01T23:30:00+00:00"
+    assert body["end"]["dateTime"] == "2025-03-02T01:00:00+00:00"
+
+def test_multi_day_all_day_event_keeps_its_span():
+    ev = GoogleEvent("event-1", "Trip", {"date": "2025-03-10"}, {"date": "2025-03-13"})
+    assert google_date_body(ev, "2025-04-01") == {"start": {"date": "2025-04-01"}, "end": {"date": "2025-04-04"}}
+
+
+def test_expired_sync_token_backfills_the_window_by_shard(tmp_path):
+    unlimited()
+    notion, gcal = FakeNotion(), FakeCalendar()
+    now = datetime.datetime.utcnow()
+    for i in range(40):
+        notion.seed_task(DATABASE_ID, f"Task {i}", (now.date() - datetime.timedelta(days=5 * i)).isoformat())
+        gcal.seed_event(CALENDAR_ID, f"Event {i}", (now.date() - datetime.timedelta(days=5 * i + 1)).isoformat())
+    store = SyncStore(str(tmp_path / "state.db"))
+    start, end = now - datetime.timedelta(days=210), now + datetime.timedelta(days=7)
+    run_sync(notion, gcal, DATABASE_ID, start, end, NullLog(), store=store, calendar_id=CALENDAR_ID)
+    event = next(ev for ev in gcal.store.values() if ev["summary"] == "Event 3")
+    gcal.edit_event_summary(event["id"], "Event 3 (edited)")
+    # Calendar answers the stored token with 410 Gone
+    gcal.sync_floor = gcal.sequence + 1
+    metrics = SyncMetrics("test")
+    run_sync(notion, gcal, DATABASE_ID, start, end, NullLog(), store=store, calendar_id=CALENDAR_ID, metrics=metrics)
+    titles = notion_titles(notion)
+    assert metrics.counters["shards_synced"] > 1
+    assert len(titles) == len(set(titles)) == 80
+    assert "Event 3 (edited)" in titles
+    assert store.load_state()["google_sync_token"]
+    store.close()
+
+def test_fetch_phases_are_wall_time_across_parallel_shards(tmp_path):
+    unlimited()
+    notion, gcal = FakeNotion(latency=0.01), FakeCalendar(latency=0.01)
+    now = datetime.datetime.utcnow()
+    for i in range(0, 200, 2):
+        date = (now.date() - datetime.timedelta(days=i)).isoformat()
+        notion.seed_task(DATABASE_ID, f"Task {i}", date)
+        gcal.seed_event(CALENDAR_ID, f"Task {i}", date)
+    store = SyncStore(str(tmp_path / "state.db"))
+    metrics = SyncMetrics("test")
+    run_sync(notion, gcal, DATABASE_ID, now - datetime.timedelta(days=200), now + datetime.timedelta(days=7),
+             NullLog(), store=store, calendar_id=CALENDAR_ID, metrics=metrics, incremental=False)
+    assert metrics.counters["shards_synced"] > 2
+    assert 0 < metrics.phases["fetch_notion"] <= metrics.phases["fetch"]
+    assert 0 < metrics.phases["fetch_google"] <= metrics.phases["fetch"]
+    store.close()
+
+
+def checkpoint_of(*shards):
+    return {"done": {str(key): [start.isoformat(), end.isoformat()] for key, start, end in shards}}
+
+def test_inner_shard_boundaries_are_aligned_to_the_epoch():
+    start, end = datetime.datetime(2025, 1, 10, 13, 45), datetime.datetime(2025, 6, 1, 8)
+    shards = window_shards(start, end, shard_days=30)
+    step = datetime.timedelta(days=30)
+    for (key, _, shard_end), (next_key, next_start, _) in zip(shards, shards[1:]):
+        assert next_key == key + 1
+        assert shard_end == next_start == SHARD_EPOCH + step * next_key
+    # Contiguous and covering exactly the window
+    assert shards[0][1] == start and shards[-1][2] == end
+
+def test_first_and_last_shards_are_partial():
+    start, end = datetime.datetime(2025, 1, 10, 13, 45), datetime.datetime(2025, 6, 1, 8)
+    shards = window_shards(start, end, shard_days=30)
+    step = datetime.timedelta(days=30)
+    first_key, first_start, first_end = shards[0]
+    last_key, last_start, last_end = shards[-1]
+    assert SHARD_EPOCH + step * first_key < first_start and first_end - first_start < step
+    assert last_start == SHARD_EPOCH + step * last_key and last_end < last_start + step
+    assert all(shard_end - shard_start == step for _, shard_start, shard_end in shards[1:-1])
+
+def test_window_inside_one_shard():
+    start = SHARD_EPOCH + datetime.timedelta(days=30 * 670 + 3)
+    assert window_shards(start, start + datetime.timedelta(days=7), shard_days=30) == [
+        (670, start, start + datetime.timedelta(days=7))]
+
+def test_shard_keys_stay_put_as_the_window_moves():
+    start, end = datetime.datetime(2025, 1, 10), datetime.datetime(2025, 6, 1)
+    later = window_shards(start + datetime.timedelta(days=3), end + datetime.timedelta(days=3), shard_days=30)
+    keys = {key: (shard_start, shard_end) for key, shard_start, shard_end in window_shards(start, end, shard_days=30)}
+    for key, shard_start, shard_end in later[1:-1]:
+        assert keys[key] == (shard_start, shard_end)
+
+def test_checkpointed_shard_is_redone_once_the_window_end_moves_past_it():
+    start, end = datetime.datetime(2025, 1, 10), datetime.datetime(2025, 6, 1)
+    shards = window_shards(start, end, shard_days=30)
+    checkpoint = checkpoint_of(*shards)
+    assert all(shard_done(checkpoint, shard) for shard in shards)
+    moved = window_shards(start, end + datetime.timedelta(days=5), shard_days=30)
+    assert [shard_done(checkpoint, shard) for shard in moved] == [True] * (len(moved) - 1) + [False]
+
+def test_checkpointed_shard_is_redone_when_the_window_starts_earlier():
+    start, end = datetime.datetime(2025, 1, 10), datetime.datetime(2025, 6, 1)
+    checkpoint = checkpoint_of(*window_shards(start, end, shard_days=30))
+    moved = window_shards(start - datetime.timedelta(days=2), end, shard_days=30)
+    assert not shard_done(checkpoint, moved[0])
+    assert all(shard_done(checkpoint, shard) for shard in moved[1:])
@@ -0,0 +1,170 @@
+# Unit tests for the planning stage: plan_sync on in-memory records, with a stub
+# standing in for the SyncStore. Run from the repository root:
+#   python -m pytest tests
+import os
+import sys
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from records import NotionTask, GoogleEvent, content_hash
+from recurrence import occurrence_sid
+from sync_plan import plan_sync, AssignNotionId, AssignGoogleId, CreateNotionTask, CreateGoogleEvent
+
+DATE = "2025-03-10"
+
+
+class KnownStub:
+    # The three SyncStore lookups the planner makes, over a dict of stored rows
+    def __init__(self, rows):
+        self.rows = rows
+
+    def is_linked(self, sid, column):
+        return bool(self.rows.get(sid, {}).get(column))
+
+    def titles_on(self, date, column):
+        return [row["title"] for row in self.rows.values() if row["date"] == date and row.get(column)]
+
+    def unlinked_on(self, date, column):
+        other = "event_id" if column == "page_id" else "page_id"
+        return [(sid, row["title"], row[column]) for sid, row in self.rows.items()
+                if row["date"] == date and row.get(column) and not row.get(other)]
+
+
+def sids():
+    counter = itertools.count(1)
+    return lambda: f"new-{next(counter)}"
+
+def task(id, title, date=DATE, sid=None, edited="2025-03-01T00:00:00.000Z"):
+    return NotionTask(id, title, date, sid, edited)
+
+def event(id, title, date=DATE, sid=None, tagged=None, updated="2025-03-01T00:00:00.000Z"):
+    return GoogleEvent(id, title, {"date": date}, {"date": date}, sid, bool(sid) if tagged is None else tagged,
+                       updated=updated)
+
+def row(title, date=DATE, page_id=None, event_id=None, notion=None, google=None):
+    # A stored row whose sides last had the given (title, date), or none at all
+    return {"title": title, "date": date, "page_id": page_id, "event_id": event_id,
+            "notion_hash": content_hash(*notion) if notion else None,
+            "google_hash": content_hash(*google) if google else None}
+
+def linked(sid, title, page_id="page-1", event_id="event-1"):
+    return {sid: row(title, page_id=page_id, event_id=event_id, notion=(title, DATE), google=(title, DATE))}
+
+def plan(tasks, events, cache=None, known=None, **kwargs):
+    return plan_sync(tasks, events, cache or {}, known=known, new_sid=sids(), **kwargs)
+
+
+def test_new_task_gets_an_id_and_an_event():
+    new = task("page-1", "Dentist")
+    p = plan([new], [])
+    assert [type(item) for item in p.items()] == [AssignNotionId, CreateGoogleEvent]
+    assert p.notion_ids[0].sid == p.google_creates[0].sid == "new-1"
+    assert (p.google_creates[0].title, p.google_creates[0].date) == ("Dentist", DATE)
+
+def test_new_event_gets_an_id_and_a_task():
+    p = plan([], [event("event-1", "Standup")])
+    assert [type(item) for item in p.items()] == [AssignGoogleId, CreateNotionTask]
+    assert p.google_ids[0].sid == p.notion_creates[0].sid == "new-1"
+
+def test_matching_unlinked_items_are_paired_not_duplicated():
+    p = plan([task("page-1", "Review", sid="sid-a")], [event("event-1", " review ")])
+    assert not p.notion_creates and not p.google_creates
+    assert [(item.event_id, item.sid) for item in p.google_ids] == [("event-1", "sid-a")]
+    assert not p.notion_ids
+
+def test_paired_event_gives_up_its_old_id():
+    p = plan([task("page-1", "Review", sid="sid-a")], [event("event-1", "Review", sid="sid-b")])
+    assert [(r.sid, r.column, r.old_id, r.new_id) for r in p.relinks] == [("sid-b", "event_id", "event-1", None)]
+    assert p.google_ids[0].sid == "sid-a"
+
+def test_loose_matching_pairs_case_and_whitespace_variants():
+    items = [task("page-1", "Team  SYNC")], [event("event-1", "team sync")]
+    assert len(plan(*items).google_creates) == 1
+    loose = plan(*items, normalize={"casefold": True, "collapse_whitespace": True})
+    assert not loose.google_creates and not loose.notion_creates
+
+def test_unchanged_linked_pair_plans_nothing():
+    p = plan([task("page-1", "Gym", sid="s")], [event("event-1", "Gym", sid="s")], linked("s", "Gym"))
+    assert len(p) == 0
+
+def test_notion_edit_patches_google():
+    p = plan([task("page-1", "Gym (late)", sid="s")], [event("event-1", "Gym", sid="s")], linked("s", "Gym"))
+    assert [(item.event_id, item.changes) for item in p.google_patches] == [("event-1", {"title": "Gym (late)"})]
+    assert not p.notion_patches
+    assert p.merged["s"] == {"title": "Gym (late)"}
+
+def test_google_edit_patches_notion_even_when_the_task_was_not_fetched():
+    moved = "2025-03-12"
+    p = plan([], [event("event-1", "Gym", date=moved, sid="s")], linked("s", "Gym"))
+    assert [(item.page_id, item.changes, item.task) for item in p.notion_patches] == [("page-1", {"date": moved}, None)]
+
+def test_edits_to_different_fields_are_merged():
+    p = plan([task("page-1", "Gym (late)", sid="s")], [event("event-1", "Gym", date="2025-03-11", sid="s")],
+             linked("s", "Gym"))
+    assert p.google_patches[0].changes == {"title": "Gym (late)"}
+    assert p.notion_patches[0].changes == {"date": "2025-03-11"}
+    assert not p.conflicts
+
+def test_conflicting_edits_keep_the_later_one():
+    p = plan([task("page-1", "Notion title", sid="s", edited="2025-03-02T10:00:00.000Z")],
+             [event("event-1", "Google title", sid="s", updated="2025-03-02T11:00:00.000Z")], linked("s", "Gym"))
+    assert [(c.field, c.winner) for c in p.conflicts] == [("title", "Google")]
+    assert p.notion_patches[0].changes == {"title": "Google title"}
+    assert not p.google_patches
+
+def test_conflict_tie_goes_to_notion():
+    stamp = "2025-03-02T10:00:00.000Z"
+    p = plan([task("page-1", "Notion title", sid="s", edited=stamp)],
+             [event("event-1", "Google title", sid="s", updated=stamp)], linked("s", "Gym"))
+    assert p.conflicts[0].winner == "Notion"
+    assert p.google_patches[0].changes == {"title": "Notion title"}
+
+def test_echo_of_our_own_write_is_not_an_edit():
+    # Google still shows the old title, but its hash is the one the store recorded for it
+    cache = {"s": row("Gym", page_id="page-1", event_id="event-1", notion=("Gym", DATE), google=("Old", DATE))}
+    p = plan([task("page-1", "Gym", sid="s")], [event("event-1", "Old", sid="s")], cache)
+    assert not p.google_patches and not p.notion_patches
+
+def test_recreated_event_is_relinked():
+    p = plan([task("page-1", "Gym", sid="s")], [event("event-2", "Gym", sid="s")], linked("s", "Gym"))
+    assert [(r.column, r.old_id, r.new_id) for r in p.relinks] == [("event_id", "event-1", "event-2")]
+    assert not p.google_creates
+
+def test_untagged_event_is_migrated_to_the_extended_property():
+    p = plan([task("page-1", "Gym", sid="s")], [event("event-1", "Gym", sid="s", tagged=False)], linked("s", "Gym"))
+    assert [(item.sid, item.migrating) for item in p.google_ids] == [("s", True)]
+
+def test_items_linked_in_the_store_are_not_created_again():
+    rows = linked("s", "Gym")
+    assert plan([task("page-1", "Gym", sid="s")], []).google_creates
+    p = plan([task("page-1", "Gym", sid="s")], [], known=KnownStub(rows))
+    assert not p.google_creates and not p.notion_creates
+
+def test_stored_titles_stop_duplicate_creates():
+    rows = {"other": row("Gym", page_id="page-9", event_id="event-9")}
+    p = plan([task("page-1", "gym")], [], known=KnownStub(rows))
+    assert not p.google_creates
+
+def test_task_pairs_with_a_stored_unlinked_event():
+    rows = {"old": row("Gym", event_id="event-7")}
+    p = plan([task("page-1", "Gym", sid="s")], [], known=KnownStub(rows))
+    assert not p.google_creates
+    assert [(item.event_id, item.sid, item.event) for item in p.google_ids] == [("event-7", "s", None)]
+    assert [(r.sid, r.old_id, r.new_id) for r in p.relinks] == [("old", "event-7", None), ("s", None, "event-7")]
+
+def test_event_pairs_with_a_stored_unlinked_page():
+    rows = {"old": row("Gym", page_id="page-7")}
+    p = plan([], [event("event-1", "Gym")], known=KnownStub(rows))
+    assert not p.notion_creates
+    assert [(item.event_id, item.sid) for item in p.google_ids] == [("event-1", "old")]
+    assert [(r.sid, r.new_id) for r in p.relinks] == [("old", "event-1")]
+
+def test_recurring_occurrence_tasks_never_create_events():
+    sid = occurrence_sid("series-1", DATE)
+    p = plan([task("page-1", "Standup", sid=sid)], [])
+    assert not p.google_creates
+
+def test_relinks_are_not_api_writes():
+    p = plan([task("page-1", "Review", sid="sid-a")], [event("event-1", "Review", sid="sid-b")])
+    assert p.relinks and p.api_writes() == len(p) - len(p.relinks)
+    assert len(list(p.describe())) == len(p)
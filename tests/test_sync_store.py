@@ -0,0 +1,72 @@
+# Unit tests for the SQLite store: the one-time import of the old JSON cache and
+# state files. Run from the repository root:
+#   python -m pytest tests
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sync_store import SyncStore
+
+LEGACY_CACHE = {
+    "sid-a": {"title": "Dentist", "date": "2025-03-10", "page_id": "page-1", "event_id": "event-1"},
+    "sid-b": {"title": "Gym", "date": "2025-03-11", "page_id": "page-2", "event_id": None},
+    # snapshot[None] from the old app, as json.dump wrote it
+    "null": {"title": "Untagged", "date": "2025-03-12", "page_id": "page-3", "event_id": "event-3"},
+}
+LEGACY_STATE = {"google_sync_token": "token-1"}
+
+
+def legacy_files(tmp_path, cache=LEGACY_CACHE, state=LEGACY_STATE):
+    paths = tmp_path / "sync_cache.json", tmp_path / "sync_state.json"
+    for path, content in zip(paths, (cache, state)):
+        path.write_text(json.dumps(content))
+    return [str(path) for path in paths]
+
+def open_store(tmp_path, json_cache, json_state):
+    return SyncStore(str(tmp_path / "state.db"), json_cache=json_cache, json_state=json_state)
+
+def stored_sids(store):
+    return sorted(sid for sid, in store.conn.execute("SELECT sid FROM links"))
+
+
+def test_legacy_cache_and_state_are_imported(tmp_path):
+    store = open_store(tmp_path, *legacy_files(tmp_path))
+    rows = store.load(["sid-a", "sid-b"])
+    assert rows["sid-a"]["event_id"] == "event-1" and rows["sid-b"]["title"] == "Gym"
+    assert rows["sid-a"]["notion_hash"] is None
+    assert store.load_state() == LEGACY_STATE
+    store.close()
+
+def test_null_key_is_not_imported(tmp_path):
+    store = open_store(tmp_path, *legacy_files(tmp_path))
+    assert stored_sids(store) == ["sid-a", "sid-b"]
+    assert not store.is_linked("null", "page_id")
+    assert store.titles_on("2025-03-12", "page_id") == []
+    store.close()
+
+def test_legacy_cache_is_imported_once(tmp_path):
+    json_cache, json_state = legacy_files(tmp_path)
+    store = open_store(tmp_path, json_cache, json_state)
+    with store.conn:
+        store.conn.execute("DELETE FROM links WHERE sid = 'sid-b'")
+    store.save_run({"sid-a": {"title": "Dentist (moved)", "date": "2025-03-14", "page_id": "page-1",
+                              "event_id": "event-1"}}, {"google_sync_token": "token-2"})
+    store.close()
+    # The JSON files are still there, but reopening leaves the store as the runs left it
+    legacy_files(tmp_path, dict(LEGACY_CACHE, **{"sid-c": {"title": "New", "date": "2025-03-15"}}))
+    store = open_store(tmp_path, json_cache, json_state)
+    assert stored_sids(store) == ["sid-a"]
+    assert store.load(["sid-a"])["sid-a"]["title"] == "Dentist (moved)"
+    assert store.load_state() == {"google_sync_token": "token-2"}
+    store.close()
+
+def test_missing_legacy_files_still_mark_the_import_done(tmp_path):
+    missing = str(tmp_path / "missing.json")
+    store = open_store(tmp_path, missing, missing)
+    assert stored_sids(store) == [] and store.load_state() == {}
+    store.close()
+    json_cache, json_state = legacy_files(tmp_path)
+    store = open_store(tmp_path, json_cache, json_state)
+    assert stored_sids(store) == []
+    store.close()